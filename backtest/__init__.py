@@ -0,0 +1,22 @@
+"""Núcleo de análise do Handicap/ML Pro"""
+
+from .analisador import BacktestAnalyzer
+from .armazem import ArmazemDatasets
+from .cache_relatorios import CacheRelatorios
+from .carga import ColunasAusentesError, carregar_dataset, hash_conteudo
+from .controle import ControleBusca
+from .dataset import DatasetCompilado
+from .etapas import HistoricoEtapas
+from .feixe import BuscaFeixe
+from .pontuacao import Candidato, MotorPontuacao, escolher_ajuste
+from .progresso import ReporterProgresso
+from .selecao import IndiceSelecao
+from .relatorio import escrever_relatorio
+from .tarefas import FilaAnalises, TarefaAnalise
+
+__all__ = [
+    "ArmazemDatasets", "BacktestAnalyzer", "BuscaFeixe", "CacheRelatorios", "Candidato", "ColunasAusentesError",
+    "ControleBusca", "DatasetCompilado", "FilaAnalises", "HistoricoEtapas", "IndiceSelecao", "MotorPontuacao",
+    "ReporterProgresso", "TarefaAnalise", "carregar_dataset", "escolher_ajuste", "escrever_relatorio",
+    "hash_conteudo",
+]
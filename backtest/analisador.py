@@ -0,0 +1,1015 @@
+"""Análise de backtest com busca gulosa, independente da interface.
+
+A interface (Streamlit ou linha de comando) se comunica com o analisador
+apenas por um `ReporterProgresso`, usado para progresso e mensagens de erro.
+"""
+
+import json
+import os
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from tabulate import tabulate
+
+from .cache_relatorios import CacheRelatorios
+from .carga import ColunasAusentesError, carregar_dataset, hash_conteudo
+from .checkpoint import caminho_checkpoint, chave_checkpoint, ler_checkpoint, remover_checkpoint, salvar_checkpoint
+from .controle import AVALIACOES, PAUSA, TEMPO, ControleBusca
+from .dataset import calcular_diferenca_placar
+from .estatisticas import criar_estatisticas, somas_grade
+from .etapas import HistoricoEtapas
+from .feixe import BuscaFeixe
+from .medicao import Medidor, encerrar_perfil, iniciar_perfil
+from .pontuacao import MotorPontuacao, escolher_ajuste
+from .progresso import ReporterProgresso
+from .relatorio import derivar_colunas, escrever_relatorio, resumir_grupos
+
+# Estado de uma análise concluída, passado de um analisador a outro por `adotar_resultados`
+CAMPOS_RESULTADO = (
+    'indices_filtrados', 'torneio_escolhido', 'campeonato_escolhido', 'tip_escolhido', 'roi_desejado',
+    'etapas_filtros', 'historico_etapas', 'config', 'melhor_etapa', 'melhor_roi', 'melhor_config',
+    'total_inicial_apostas', 'limite_minimo_apostas', 'roi_inicial', 'perfil_etapas', 'fronteira_pareto',
+    'interrupcao', 'medidor', 'perfil_cprofile',
+)
+
+# Intervalo mínimo entre checkpoints gravados durante a busca (além do gravado ao interromper)
+INTERVALO_CHECKPOINT_S = 30.0
+
+MOTIVOS_INTERRUPCAO = {
+    PAUSA: "pausada",
+    TEMPO: "tempo limite atingido",
+    AVALIACOES: "limite de avaliações atingido",
+}
+
+
+def descrever_ajuste(tipo, valor):
+    """Descrição de um ajuste (candidato aplicado) para a tabela de etapas"""
+    if tipo == 'w1':
+        return f"Winrate 1 mínimo = {valor:.2f}%"
+    elif tipo == 'w2':
+        return f"Winrate 2 mínimo = {valor:.2f}%"
+    elif tipo == 'w1_w2':
+        return f"Winrate 1 mínimo = {valor[0]:.2f}% e Winrate 2 mínimo = {valor[1]:.2f}%"
+    elif tipo == 'apostas_a_favor':
+        return f"Excluídas apostas a favor de {valor}"
+    elif tipo == 'apostas_contra':
+        return f"Excluídas apostas contra {valor}"
+    elif tipo == 'confronto':
+        return f"Excluído confronto {valor}"
+    elif tipo == 'campeonato':
+        return f"Excluído campeonato {valor}"
+    elif tipo == 'tipo_aposta':
+        return f"Excluídas apostas a favor do {valor}"
+    elif tipo == 'tipo_local':
+        return f"Excluídas apostas a favor do {valor}"
+    elif tipo == 'time_a_favor':
+        return f"Excluídas apostas a favor do time {valor}"
+    elif tipo == 'time_contra':
+        return f"Excluídas apostas contra o time {valor}"
+    elif tipo == 'diferenca_placar_min':
+        return f"Diferença de placar mínima = {valor}"
+    elif tipo == 'diferenca_placar_max':
+        return f"Diferença de placar máxima = {valor}"
+    else:
+        return f"Aplicado filtro {tipo}: {valor}"
+
+
+class BacktestAnalyzer:
+    """Classe principal para análise de backtest com busca otimizada"""
+    
+    def __init__(self, reporter=None, carregador=None, config_file="busca_config_streamlit.json",
+                 diretorio_checkpoints=None, armazem=None):
+        self.reset_state()
+        self.config_file = config_file
+        self.diretorio_checkpoints = diretorio_checkpoints
+        self.controle = None
+        self._checkpoint = None
+        self._ultimo_checkpoint = 0.0
+        self.reporter = reporter or ReporterProgresso()
+        # carregador(chave, conteudo, nome_arquivo) -> DatasetCompilado; a interface pode trocar por uma versão com cache
+        self.carregador = carregador or (lambda chave, conteudo, nome_arquivo: carregar_dataset(conteudo, nome_arquivo, chave=chave))
+        # Com um ArmazemDatasets, o dataset é compartilhado com as outras sessões do processo
+        self.armazem = armazem
+        # Perfil completo (cProfile) de cada análise, ligado pela interface; não é salvo na configuração
+        self.capturar_perfil = False
+        
+        # Configurações padrão da busca gulosa
+        self.default_busca_config = {
+            'usar_winrate1': True,
+            'usar_winrate2': True,
+            'usar_grade_winrates': False,
+            'usar_excl_campeonatos': True,
+            'usar_excl_apostas_a_favor': True,
+            'usar_excl_apostas_contra': True,
+            'usar_excl_confrontos': True,
+            'usar_excl_times_a_favor': True,
+            'usar_excl_times_contra': True,
+            'usar_excl_tipo_apostas': True,
+            'usar_excl_tipo_local': True,
+            'usar_diferenca_placar_min': True,
+            'usar_diferenca_placar_max': True
+        }
+        
+        # Configurações de quantidade mínima
+        self.default_min_config = {
+            'min_campeonatos': 10,
+            'min_apostas_a_favor': 10,
+            'min_apostas_contra': 10,
+            'min_confrontos': 10,
+            'min_times_a_favor': 10,
+            'min_times_contra': 10,
+            'min_tipo_apostas': 10,
+            'min_tipo_local': 10,
+            'min_winrate1': 10,
+            'min_winrate2': 10,
+            'min_diferenca_placar': 10
+        }
+        
+        # Configurações de desempenho da busca
+        self.default_desempenho_config = {
+            'workers_familias': 1,
+            'cache_relatorios_mb': 64,
+            'medir_desempenho': False
+        }
+        
+        # Estratégia da busca: gulosa (um ajuste por etapa) ou em feixe, com orçamentos opcionais (0 = sem limite)
+        self.default_estrategia_config = {
+            'modo': 'gulosa',
+            'largura_feixe': 5,
+            'tempo_limite_s': 0,
+            'max_avaliacoes': 0,
+            'max_etapas': 100,
+            'max_candidatos_familia': 0
+        }
+        
+        self.carregar_configuracoes()
+        
+        # Relatórios já gerados por (arquivo, seleção, etapa, configuração); sobrevivem ao reset
+        self.relatorios = CacheRelatorios(self.desempenho_config['cache_relatorios_mb'] * 1024 * 1024)
+    
+    def reset_state(self):
+        """Reset do estado da aplicação"""
+        self.liberar_dataset()
+        self.dataset = None
+        self.id_arquivo = None
+        self.hash_arquivo = None
+        self.tempo_carga = None
+        self.indices_filtrados = None
+        self.torneio_escolhido = None
+        self.campeonato_escolhido = None
+        self.tip_escolhido = None
+        self.roi_desejado = None
+        self.etapas_filtros = []
+        self.historico_etapas = None
+        self.config = None
+        self.melhor_etapa = None
+        self.melhor_roi = None
+        self.melhor_config = None
+        self.total_inicial_apostas = 0
+        self.limite_minimo_apostas = 0
+        self.roi_inicial = 0
+        self.perfil_etapas = []
+        self.fronteira_pareto = []
+        self.interrupcao = None
+        self._feixe_atual = None
+        self.medidor = Medidor(ativo=False)
+        self.perfil_cprofile = None
+        
+    @property
+    def df(self):
+        """DataFrame da planilha carregada (None sem arquivo)"""
+        return self.dataset.df if self.dataset is not None else None
+    
+    @property
+    def melhor_df(self):
+        """DataFrame da etapa com melhor ROI, materializado sob demanda"""
+        if self.melhor_etapa is None:
+            return None
+        return self.obter_df_etapa(self.melhor_etapa)
+    
+    def obter_df_etapa(self, etapa_numero):
+        """Materializar as linhas de uma etapa (posição em etapas_filtros)"""
+        return self.dataset.linhas(self.historico_etapas.indices(etapa_numero))
+    
+    def carregar_configuracoes(self):
+        """Carregar configurações salvas"""
+        try:
+            if os.path.exists(self.config_file):
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    config_data = json.load(f)
+                self.busca_config = config_data.get('busca_config', self.default_busca_config)
+                self.min_entradas_config = config_data.get('min_entradas_config', self.default_min_config)
+                self.desempenho_config = {**self.default_desempenho_config, **config_data.get('desempenho_config', {})}
+                self.estrategia_config = {**self.default_estrategia_config, **config_data.get('estrategia_config', {})}
+            else:
+                self.busca_config = self.default_busca_config.copy()
+                self.min_entradas_config = self.default_min_config.copy()
+                self.desempenho_config = self.default_desempenho_config.copy()
+                self.estrategia_config = self.default_estrategia_config.copy()
+        except Exception as e:
+            self.reporter.erro(f"Erro ao carregar configurações: {e}")
+            self.busca_config = self.default_busca_config.copy()
+            self.min_entradas_config = self.default_min_config.copy()
+            self.desempenho_config = self.default_desempenho_config.copy()
+            self.estrategia_config = self.default_estrategia_config.copy()
+    
+    def salvar_configuracoes(self):
+        """Salvar configurações atuais"""
+        try:
+            config_data = {
+                'busca_config': self.busca_config,
+                'min_entradas_config': self.min_entradas_config,
+                'desempenho_config': self.desempenho_config,
+                'estrategia_config': self.estrategia_config
+            }
+            with open(self.config_file, 'w', encoding='utf-8') as f:
+                json.dump(config_data, f, indent=2, ensure_ascii=False)
+            return True
+        except Exception as e:
+            self.reporter.erro(f"Erro ao salvar configurações: {e}")
+            return False
+    
+    def carregar_arquivo(self, uploaded_file):
+        """Carregar e processar arquivo Excel ou CSV (memória > snapshot > leitura do arquivo)"""
+        try:
+            # Mesmo upload do rerun anterior: nada a refazer
+            id_arquivo = getattr(uploaded_file, 'file_id', None)
+            if self.dataset is not None and id_arquivo is not None and id_arquivo == self.id_arquivo:
+                return True
+            
+            inicio = time.perf_counter()
+            if isinstance(uploaded_file, (str, os.PathLike)):
+                with open(uploaded_file, 'rb') as f:
+                    conteudo = f.read()
+                nome_arquivo = os.path.basename(uploaded_file)
+            else:
+                conteudo = uploaded_file.getvalue()
+                nome_arquivo = getattr(uploaded_file, 'name', None)
+            chave = hash_conteudo(conteudo)
+            if self.dataset is None or chave != self.hash_arquivo:
+                self.dataset = self._obter_dataset(chave, conteudo, nome_arquivo)
+                self.hash_arquivo = chave
+            self.id_arquivo = id_arquivo
+            self.tempo_carga = time.perf_counter() - inicio
+            
+            return True
+            
+        except ColunasAusentesError as e:
+            self.reporter.erro(f"❌ {e}")
+            return False
+        except Exception as e:
+            self.reporter.erro(f"❌ Erro ao carregar arquivo: {e}")
+            return False
+    
+    def usar_dataset(self, dataset):
+        """Passar a usar um dataset já compilado (por exemplo, aberto de `snapshot.abrir_compilado`)"""
+        self.liberar_dataset()
+        self.dataset = dataset
+        self.hash_arquivo = dataset.chave
+        self.id_arquivo = None
+    
+    def _obter_dataset(self, chave, conteudo, nome_arquivo):
+        """Dataset do arquivo; com o armazém, troca a referência ao arquivo anterior pela deste"""
+        if self.armazem is None:
+            return self.carregador(chave, conteudo, nome_arquivo)
+        dataset = self.armazem.adquirir(chave, conteudo, nome_arquivo)
+        self.liberar_dataset()
+        # A referência volta ao armazém também quando a sessão acaba e o analisador é coletado
+        self._referencia = weakref.finalize(self, self.armazem.liberar, chave)
+        return dataset
+    
+    def liberar_dataset(self):
+        """Devolver ao armazém a referência ao dataset atual (nada a fazer sem armazém)"""
+        referencia, self._referencia = getattr(self, '_referencia', None), None
+        if referencia is not None:
+            referencia()
+    
+    def obter_opcoes_formulario(self):
+        """Obter opções disponíveis para os formulários"""
+        if self.dataset is None:
+            return {}
+        
+        return {'torneios': self.dataset.indice_selecao().torneios}
+    
+    def obter_campeonatos(self, torneio_escolhido):
+        """Obter campeonatos baseado no torneio escolhido"""
+        if self.dataset is None:
+            return ["Todos os campeonatos"]
+        
+        return self.dataset.indice_selecao().campeonatos(torneio_escolhido)
+    
+    def obter_tips_disponiveis(self, torneio_escolhido, campeonato_escolhido):
+        """Obter tips disponíveis baseado nas seleções"""
+        if self.dataset is None:
+            return []
+        
+        return self.dataset.indice_selecao().tips(torneio_escolhido, campeonato_escolhido)
+    
+    def obter_resumo_selecao(self, torneio, campeonato="Todos os campeonatos", tip=None):
+        """Entradas, lucro e ROI base de uma seleção, lidos do índice do dataset"""
+        if self.dataset is None:
+            return {'entradas': 0, 'lucro': 0.0, 'roi': -float('inf')}
+        
+        entradas, lucro = self.dataset.indice_selecao().totais(torneio, campeonato, tip)
+        return {'entradas': entradas, 'lucro': lucro, 'roi': lucro / entradas if entradas > 0 else -float('inf')}
+    
+    def filtrar_dados_iniciais(self, torneio, campeonato, tip):
+        """Filtrar dados baseado nas seleções iniciais (uma máscara combinada sobre os códigos)"""
+        if self.dataset is None:
+            return False
+        
+        mantidas = np.ones(self.dataset.total, dtype=bool)
+        
+        # Filtrar por torneio
+        if torneio == "Todos os torneios":
+            self.torneio_escolhido = None
+        else:
+            mantidas &= self.dataset.iguais_a('Torneio', torneio)
+            self.torneio_escolhido = torneio
+        
+        # Filtrar por campeonato
+        if campeonato == "Todos os campeonatos":
+            self.campeonato_escolhido = None
+        else:
+            mantidas &= self.dataset.iguais_a('Campeonato', campeonato)
+            self.campeonato_escolhido = campeonato
+        
+        # Filtrar por tip
+        if tip in ('Over', 'Under'):
+            mantidas &= self.dataset.iguais_a('Tip', tip)
+            self.tip_escolhido = tip
+        else:
+            self.tip_escolhido = None
+        
+        self.indices_filtrados = np.flatnonzero(mantidas)
+        return True
+    
+    @property
+    def df_filtrado(self):
+        """Linhas da seleção inicial, materializadas sob demanda"""
+        if self.indices_filtrados is None:
+            return None
+        return self.dataset.linhas(self.indices_filtrados)
+    
+    def calcular_roi(self, df_atual):
+        """Calcular ROI do dataframe atual"""
+        if df_atual is None or len(df_atual) == 0:
+            return -float('inf')
+        
+        with self.medidor.medir("roi", len(df_atual)):
+            lucro_total = df_atual['Lucro/Prej.'].sum()
+        total_apostas = len(df_atual)
+        return lucro_total / total_apostas if total_apostas > 0 else -float('inf')
+    
+    def calcular_diferenca_placar(self, placar):
+        """Calcular diferença entre placares"""
+        return calcular_diferenca_placar(placar)
+    
+    def _roi_de(self, indices):
+        """ROI das linhas `indices` do dataset compilado"""
+        if len(indices) == 0:
+            return -float('inf')
+        with self.medidor.medir("roi", len(indices)):
+            return self.dataset.lucro_de(indices) / len(indices)
+    
+    def aplicar_filtros(self, df_base, config):
+        """Aplicar filtros baseado na configuração"""
+        # O índice de df_base é a posição das linhas no dataset compilado
+        with self.medidor.medir("filtros", len(df_base)):
+            return df_base[self.dataset.mascara(df_base.index.to_numpy(), config)]
+    
+    def _avaliar_config(self, indices, config):
+        """Aplicar a configuração aos índices, retornando lucro, entradas e índices mantidos"""
+        with self.medidor.medir("filtros", len(indices)):
+            mantidos = self.dataset.filtrar(indices, config)
+        return self.dataset.lucro_de(mantidos), len(mantidos), mantidos
+    
+    def iniciar_analise(self, torneio, campeonato, tip, roi_desejado_pct, controle=None):
+        """Iniciar análise completa com busca (`controle`: ControleBusca criado por quem pode pausá-la)"""
+        return self._analisar(torneio, campeonato, tip, roi_desejado_pct, retomar=False, controle=controle)
+    
+    def retomar_analise(self, torneio, campeonato, tip, roi_desejado_pct, controle=None):
+        """Continuar a busca interrompida (pausa, orçamento ou sessão encerrada) desta seleção"""
+        return self._analisar(torneio, campeonato, tip, roi_desejado_pct, retomar=True, controle=controle)
+    
+    def novo_controle(self):
+        """ControleBusca com os orçamentos da estratégia configurada"""
+        return ControleBusca(self._tempo_limite(), self.estrategia_config.get('max_avaliacoes', 0))
+    
+    def pausar_analise(self):
+        """Pedir que a busca em andamento pare na próxima etapa, salvando seu estado"""
+        if self.controle is not None:
+            self.controle.pausar()
+    
+    def checkpoint_disponivel(self, torneio, campeonato, tip):
+        """Se há uma busca salva para continuar com este arquivo, seleção e configurações"""
+        if self.hash_arquivo is None:
+            return False
+        return os.path.exists(caminho_checkpoint(self.chave_busca(torneio, campeonato, tip),
+                                                 self.diretorio_checkpoints))
+    
+    def chave_busca(self, torneio, campeonato, tip):
+        """Identificação da busca: arquivo, seleção e tudo o que muda os candidatos"""
+        estrategia = {'modo': self.estrategia_config.get('modo', 'gulosa'),
+                      'max_candidatos_familia': self.estrategia_config.get('max_candidatos_familia', 0)}
+        if estrategia['modo'] == 'feixe':
+            estrategia['largura_feixe'] = int(self.estrategia_config.get('largura_feixe', 5))
+        return chave_checkpoint(self.hash_arquivo, [torneio, campeonato, tip],
+                                self.busca_config, self.min_entradas_config, estrategia)
+    
+    def _salvar_checkpoint(self, salvo):
+        """Gravar `salvo`, o par (estado, linhas) montado pela busca"""
+        if self._checkpoint is not None:
+            self._ultimo_checkpoint = time.perf_counter()
+            estado, linhas = salvo
+            salvar_checkpoint(self._checkpoint, estado, linhas, self.hash_arquivo, self.diretorio_checkpoints)
+    
+    def _checkpoint_periodico(self, montar_estado):
+        """Gravar o estado a cada `INTERVALO_CHECKPOINT_S`, para sobreviver a um processo encerrado"""
+        if time.perf_counter() - self._ultimo_checkpoint >= INTERVALO_CHECKPOINT_S:
+            self._salvar_checkpoint(montar_estado())
+    
+    def _encerrar_checkpoint(self, montar_estado):
+        """Salvar o estado de uma busca interrompida ou apagar o de uma busca concluída"""
+        if self.interrupcao is not None:
+            self._salvar_checkpoint(montar_estado())
+        elif self._checkpoint is not None:
+            remover_checkpoint(self._checkpoint, self.diretorio_checkpoints)
+    
+    def _publicar_etapa(self, etapa):
+        """Enviar ao reporter a etapa aceita, sem a configuração, para a interface mostrar ao vivo"""
+        self.reporter.etapa({campo: etapa[campo] for campo in ('numero', 'ajuste', 'entradas', 'lucro', 'roi')})
+    
+    def _analisar(self, torneio, campeonato, tip, roi_desejado_pct, retomar, controle=None):
+        # Orçamento novo a cada execução; pode ser pausado desde já por outra thread
+        self.controle = controle or self.novo_controle()
+        # Medição e perfil próprios de cada análise; os relatórios gerados depois somam na mesma medição
+        self.medidor = Medidor(ativo=bool(self.desempenho_config.get('medir_desempenho', False)))
+        self.perfil_cprofile = None
+        try:
+            # Converter ROI para decimal
+            self.roi_desejado = float(roi_desejado_pct) / 100
+            
+            # Filtrar dados iniciais
+            if not self.filtrar_dados_iniciais(torneio, campeonato, tip):
+                return False, "Erro ao filtrar dados iniciais"
+            
+            # Configurar estado inicial
+            self.total_inicial_apostas = len(self.indices_filtrados)
+            self.limite_minimo_apostas = max(1, self.total_inicial_apostas * 0.05)  # Mínimo 5% dos dados originais
+            self.roi_inicial = self._roi_de(self.indices_filtrados)
+            
+            if self.total_inicial_apostas == 0:
+                return False, "Nenhum dado encontrado com os filtros aplicados"
+            
+            self._checkpoint = self.chave_busca(torneio, campeonato, tip)
+            retomada = None
+            aviso = ""
+            if retomar:
+                retomada = ler_checkpoint(self._checkpoint, self.hash_arquivo, self.diretorio_checkpoints)
+                if retomada is None:
+                    # Checkpoint de outra versão, de outro arquivo ou corrompido: a busca recomeça
+                    remover_checkpoint(self._checkpoint, self.diretorio_checkpoints)
+                    aviso = " A busca salva não pôde ser usada; a análise recomeçou do início."
+            
+            # Executar busca na estratégia configurada
+            self._ultimo_checkpoint = time.perf_counter()
+            perfilador = iniciar_perfil() if self.capturar_perfil else None
+            try:
+                with self.medidor.medir("busca", self.total_inicial_apostas):
+                    if self.estrategia_config.get('modo') == 'feixe':
+                        self.busca_feixe(retomada)
+                    else:
+                        self.busca_gulosa(retomada)
+            finally:
+                if perfilador is not None:
+                    self.perfil_cprofile = encerrar_perfil(perfilador)
+            
+            if self.interrupcao is not None:
+                return True, (f"Busca interrompida ({MOTIVOS_INTERRUPCAO[self.interrupcao]}) com "
+                              f"{len(self.etapas_filtros)} etapas; o estado foi salvo para continuar.{aviso}")
+            return True, f"Análise concluída! {len(self.etapas_filtros)} etapas geradas.{aviso}"
+            
+        except Exception as e:
+            return False, f"Erro durante análise: {str(e)}"
+        finally:
+            self.controle.encerrar()
+    
+    def progresso(self):
+        """Situação da busca em andamento (ou da última): etapa, melhor ROI e candidatos avaliados por segundo"""
+        busca = self._feixe_atual
+        if busca is not None and busca.melhor is not None:
+            etapa, melhor_roi = busca.profundidade, busca.melhor.roi
+        else:
+            etapa, melhor_roi = max(len(self.etapas_filtros) - 1, 0), self.melhor_roi
+        avaliacoes = decorrido = 0
+        if self.controle is not None:
+            avaliacoes, decorrido = self.controle.avaliacoes, self.controle.tempo_decorrido()
+        return {
+            'etapa': etapa,
+            'melhor_roi': melhor_roi,
+            'avaliacoes': avaliacoes,
+            'decorrido': decorrido,
+            'avaliacoes_por_s': avaliacoes / decorrido if decorrido > 0 else 0.0,
+        }
+    
+    def derivar(self, reporter=None):
+        """Analisador independente sobre o mesmo dataset, com cópias das configurações atuais.
+        
+        Usado para buscas em segundo plano: a sessão pode mudar as configurações
+        enquanto a busca roda sem alterá-la, e adota o resultado no fim.
+        """
+        outro = BacktestAnalyzer(reporter=reporter, carregador=self.carregador, config_file=self.config_file,
+                                 diretorio_checkpoints=self.diretorio_checkpoints, armazem=self.armazem)
+        outro.dataset, outro.hash_arquivo = self.dataset, self.hash_arquivo
+        # Referência própria no armazém: o dataset não é descartado se a sessão trocar de arquivo ou acabar
+        if self.armazem is not None and self.armazem.reter(self.hash_arquivo):
+            outro._referencia = weakref.finalize(outro, self.armazem.liberar, self.hash_arquivo)
+        outro.busca_config = dict(self.busca_config)
+        outro.min_entradas_config = dict(self.min_entradas_config)
+        outro.desempenho_config = dict(self.desempenho_config)
+        outro.estrategia_config = dict(self.estrategia_config)
+        outro.capturar_perfil = self.capturar_perfil
+        return outro
+    
+    def adotar_resultados(self, outro):
+        """Passar a mostrar o resultado da busca feita por `outro` (de `derivar`) sobre o mesmo arquivo"""
+        if outro.hash_arquivo != self.hash_arquivo:
+            return False
+        for campo in CAMPOS_RESULTADO:
+            setattr(self, campo, getattr(outro, campo))
+        return True
+    
+    def _config_inicial(self):
+        """Configuração sem nenhum ajuste"""
+        return {
+            'w1': None, 
+            'w2': None, 
+            'apostas_a_favor_excl': [], 
+            'apostas_contra_excl': [], 
+            'confrontos': [],
+            'campeonatos_excl': [],
+            'times_a_favor_excl': [],
+            'times_contra_excl': [],
+            'tipo_apostas_excl': [],
+            'tipo_local_excl': [],
+            'diferenca_placar_min': None,
+            'diferenca_placar_max': None
+        }
+    
+    def _tempo_limite(self):
+        """Limite de tempo da busca em segundos (0 = sem limite)"""
+        return float(self.estrategia_config.get('tempo_limite_s', 0) or 0)
+    
+    def _max_etapas(self):
+        """Número máximo de etapas da busca, contando o estado inicial"""
+        return int(self.estrategia_config.get('max_etapas', 100) or 100)
+    
+    def _estado_gulosa(self):
+        """Estado (JSON) e linhas (histórico) da busca gulosa para o checkpoint; as somas por grupo são remontadas"""
+        estado = {
+            'modo': 'gulosa',
+            'etapas_filtros': self.etapas_filtros,
+            'total_etapas': self.historico_etapas.total,
+            'melhor_etapa': self.melhor_etapa,
+            'melhor_roi': self.melhor_roi,
+            'melhor_config': self.melhor_config,
+            'perfil_etapas': self.perfil_etapas,
+        }
+        return estado, self.historico_etapas.exportar()
+    
+    def busca_gulosa(self, retomada=None):
+        """Executar busca para otimização (ou continuar a de `retomada`, o (estado, linhas) de um checkpoint)"""
+        self.fronteira_pareto = []
+        self.interrupcao = None
+        self._feixe_atual = None
+        controle = self.controle or self.novo_controle()
+        
+        if retomada is not None:
+            # A última etapa salva é o estado atual
+            estado, linhas = retomada
+            self.etapas_filtros = estado['etapas_filtros']
+            self.historico_etapas = HistoricoEtapas.restaurar(linhas, estado['total_etapas'])
+            indices = self.historico_etapas.indices(self.historico_etapas.total - 1)
+            self.config = self.etapas_filtros[-1]['config'].copy()
+            self.melhor_etapa = estado['melhor_etapa']
+            self.melhor_roi = estado['melhor_roi']
+            self.melhor_config = estado['melhor_config']
+            self.perfil_etapas = estado['perfil_etapas']
+            roi_atual = self.etapas_filtros[-1]['roi']
+        else:
+            self.config = self._config_inicial()
+            
+            # Estado atual como posições das linhas no dataset compilado
+            indices = self.indices_filtrados
+            roi_atual = self._roi_de(indices)
+            self.melhor_etapa = 0
+            self.melhor_roi = roi_atual
+            self.melhor_config = self.config.copy()
+            
+            # As etapas guardam só metadados; as linhas ficam no histórico compacto
+            self.etapas_filtros = []
+            self.historico_etapas = HistoricoEtapas(indices)
+            
+            # Tempos de cada iteração e de cada família de candidatos
+            self.perfil_etapas = []
+            
+            # Etapa inicial
+            self.etapas_filtros.append({
+                'numero': 0,
+                'ajuste': "Estado inicial",
+                'entradas': len(indices),
+                'lucro': self.dataset.lucro_de(indices),
+                'roi': roi_atual,
+                'config': self.config.copy()
+            })
+        
+        # Somas por grupo montadas uma vez e atualizadas só com as linhas removidas
+        estatisticas = criar_estatisticas(self.dataset, indices)
+        
+        contador_etapas = self.etapas_filtros[-1]['numero'] + 1
+        max_etapas = self._max_etapas()
+        
+        # Famílias de candidatos pontuadas em paralelo (numpy/pandas liberam o GIL nas somas)
+        workers = int(self.desempenho_config.get('workers_familias', 1))
+        executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        
+        self.reporter.iniciar()
+        # Etapas já existentes (a inicial, ou todas as de uma busca retomada)
+        for etapa in self.etapas_filtros:
+            self._publicar_etapa(etapa)
+        try:
+            self._passos_gulosa(indices, roi_atual, estatisticas, contador_etapas, max_etapas, controle, executor)
+        except BaseException:
+            # Sessão encerrada ou erro no meio da busca: o estado da última etapa fica salvo
+            self._salvar_checkpoint(self._estado_gulosa())
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        self._encerrar_checkpoint(self._estado_gulosa)
+        self.reporter.concluir("✅ Análise concluída!")
+    
+    def _passos_gulosa(self, indices, roi_atual, estatisticas, contador_etapas, max_etapas, controle, executor):
+        """Etapas da busca gulosa até não haver ajuste que melhore o ROI ou o orçamento acabar"""
+        while contador_etapas < max_etapas:
+            self.interrupcao = controle.motivo_parada()
+            if self.interrupcao is not None:
+                break
+            self.reporter.atualizar(min(contador_etapas / max_etapas, 0.95), f"🔄 Processando etapa {contador_etapas}...")
+            
+            # Pontuar todos os candidatos por deltas de grupo; só o escolhido é materializado
+            inicio = time.perf_counter()
+            motor = MotorPontuacao(estatisticas, self.config, self.busca_config, self.min_entradas_config,
+                                   self.limite_minimo_apostas, self.estrategia_config.get('max_candidatos_familia', 0))
+            candidatos = motor.gerar_candidatos(executor)
+            controle.contar(len(candidatos))
+            fim_pontuacao = time.perf_counter()
+            escolhido = escolher_ajuste(
+                candidatos, roi_atual, self.limite_minimo_apostas, motor.margem,
+                lambda candidato: self._avaliar_config(indices, candidato.config)
+            )
+            self.perfil_etapas.append({
+                'iteracao': contador_etapas,
+                'candidatos': len(candidatos),
+                'entradas': len(indices),
+                'pontuacao': fim_pontuacao - inicio,
+                'escolha': time.perf_counter() - fim_pontuacao,
+                'familias': motor.tempos,
+            })
+            self._medir_perfil(self.perfil_etapas[-1], len(indices))
+            
+            # Sem ajuste que melhore o ROI o estado não muda, então a busca termina aqui
+            if escolhido is None:
+                break
+            
+            melhor_ajuste, indices_novos = escolhido
+            tipo, valor, config_novo = melhor_ajuste.tipo, melhor_ajuste.valor, melhor_ajuste.config
+            
+            descricao_ajuste = descrever_ajuste(tipo, valor)
+            
+            # Atualizar estado
+            estatisticas.atualizar(indices_novos)
+            indices = indices_novos
+            self.config = config_novo
+            lucro_atual = self.dataset.lucro_de(indices)
+            roi_atual = lucro_atual / len(indices)
+            
+            # Adicionar etapa
+            self.etapas_filtros.append({
+                'numero': contador_etapas,
+                'ajuste': descricao_ajuste,
+                'entradas': len(indices),
+                'lucro': lucro_atual,
+                'roi': roi_atual,
+                'config': self.config.copy()
+            })
+            self.historico_etapas.registrar(indices)
+            self._publicar_etapa(self.etapas_filtros[-1])
+            
+            # Atualizar melhor resultado se necessário
+            if roi_atual > self.melhor_roi:
+                self.melhor_etapa = len(self.etapas_filtros) - 1
+                self.melhor_roi = roi_atual
+                self.melhor_config = self.config.copy()
+            
+            # Verificar se atingiu o limite mínimo de apostas
+            if len(indices) < self.limite_minimo_apostas:
+                break
+            
+            contador_etapas += 1
+            self._checkpoint_periodico(self._estado_gulosa)
+    
+    def busca_feixe(self, retomada=None):
+        """Executar a busca em feixe; as etapas são o caminho até o melhor estado encontrado"""
+        indices = self.indices_filtrados
+        largura = int(self.estrategia_config.get('largura_feixe', 5))
+        workers = int(self.desempenho_config.get('workers_familias', 1))
+        executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        
+        def estado_feixe(busca):
+            dados, linhas = busca.exportar()
+            return {'modo': 'feixe', 'feixe': dados}, linhas
+        
+        publicado = None
+        
+        def avancar(busca):
+            # O melhor estado muda de caminho entre profundidades: publica cada novo melhor como etapa
+            nonlocal publicado
+            if busca.melhor is not publicado and busca.melhor.passos:
+                publicado = busca.melhor
+                ultimo = publicado.passos[-1]
+                self._publicar_etapa({'numero': len(publicado.passos), 'ajuste': descrever_ajuste(ultimo.tipo, ultimo.valor),
+                                      'entradas': publicado.entradas, 'lucro': publicado.lucro, 'roi': publicado.roi})
+            self._checkpoint_periodico(lambda: estado_feixe(busca))
+        
+        busca = BuscaFeixe(self.dataset, self.busca_config, self.min_entradas_config, self.limite_minimo_apostas,
+                           largura, controle=self.controle, max_profundidade=self._max_etapas(),
+                           max_candidatos=self.estrategia_config.get('max_candidatos_familia', 0),
+                           executor=executor, reporter=self.reporter,
+                           ao_avancar=avancar)
+        self._feixe_atual = busca
+        self.reporter.iniciar()
+        self._publicar_etapa({'numero': 0, 'ajuste': "Estado inicial", 'entradas': len(indices),
+                              'lucro': self.dataset.lucro_de(indices), 'roi': self._roi_de(indices)})
+        try:
+            if retomada is not None:
+                estado, linhas = retomada
+                melhor = busca.retomar(estado['feixe'], linhas)
+            else:
+                melhor = busca.executar(self._config_inicial(), indices, criar_estatisticas(self.dataset, indices))
+        except BaseException:
+            if busca.melhor is not None:
+                self._salvar_checkpoint(estado_feixe(busca))
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        self.interrupcao = busca.interrupcao
+        self._encerrar_checkpoint(lambda: estado_feixe(busca))
+        self.perfil_etapas = busca.perfil
+        # Profundidades desta execução (as de antes da retomada já foram medidas na execução delas)
+        for perfil in busca.perfil[len(retomada[0]['feixe']['perfil']) if retomada is not None else 0:]:
+            self._medir_perfil(perfil, perfil['entradas'])
+        
+        # Etapas: estado inicial e cada passo do caminho até o melhor estado
+        self.config = self._config_inicial()
+        self.etapas_filtros = [{
+            'numero': 0,
+            'ajuste': "Estado inicial",
+            'entradas': len(indices),
+            'lucro': self.dataset.lucro_de(indices),
+            'roi': self._roi_de(indices),
+            'config': self.config.copy()
+        }]
+        self.historico_etapas = HistoricoEtapas(indices)
+        for numero, passo in enumerate(melhor.passos, start=1):
+            # Os filtros são cumulativos: a configuração do passo sobre a seleção inicial dá as linhas da etapa
+            indices_etapa = self.dataset.filtrar(self.indices_filtrados, passo.config)
+            lucro = self.dataset.lucro_de(indices_etapa)
+            self.config = passo.config
+            self.etapas_filtros.append({
+                'numero': numero,
+                'ajuste': descrever_ajuste(passo.tipo, passo.valor),
+                'entradas': len(indices_etapa),
+                'lucro': lucro,
+                'roi': lucro / len(indices_etapa),
+                'config': self.config.copy()
+            })
+            self.historico_etapas.registrar(indices_etapa)
+        
+        self.melhor_etapa = max(range(len(self.etapas_filtros)), key=lambda i: (self.etapas_filtros[i]['roi'], -i))
+        self.melhor_roi = self.etapas_filtros[self.melhor_etapa]['roi']
+        self.melhor_config = self.etapas_filtros[self.melhor_etapa]['config'].copy()
+        
+        self.fronteira_pareto = [{
+            'entradas': estado.entradas,
+            'lucro': estado.lucro,
+            'roi': estado.roi,
+            'ajustes': [descrever_ajuste(passo.tipo, passo.valor) for passo in estado.passos],
+            'config': estado.config
+        } for estado in busca.fronteira()]
+        self.reporter.concluir("✅ Análise concluída!")
+    
+    def _medir_perfil(self, perfil, linhas):
+        """Somar na medição a pontuação, a escolha e as famílias de uma etapa do perfil"""
+        self.medidor.registrar("etapa: pontuação", perfil['pontuacao'], linhas)
+        self.medidor.registrar("etapa: escolha", perfil['escolha'], linhas)
+        for familia, segundos in perfil['familias'].items():
+            self.medidor.registrar(f"família: {familia}", segundos, linhas)
+    
+    def exportar_desempenho(self):
+        """Medição por seção e perfil de cada etapa da última análise, serializáveis em JSON"""
+        return {
+            'arquivo': self.hash_arquivo,
+            'selecao': [self.torneio_escolhido, self.campeonato_escolhido, self.tip_escolhido],
+            'estrategia': self.estrategia_config,
+            'entradas_iniciais': self.total_inicial_apostas,
+            'secoes': self.medidor.resumo(),
+            'etapas': self.perfil_etapas,
+        }
+    
+    def _chave_relatorio(self, etapa_numero):
+        """Identificação do relatório de uma etapa: arquivo, seleção, etapa e configuração"""
+        etapa = self.etapas_filtros[etapa_numero]
+        return (self.hash_arquivo, self.torneio_escolhido, self.campeonato_escolhido, self.tip_escolhido,
+                etapa_numero, json.dumps(etapa['config'], sort_keys=True, default=str))
+    
+    def _gerador_relatorio(self, etapa_numero):
+        """Função que gera o relatório da etapa com o estado capturado agora, segura para outra thread"""
+        etapa = self.etapas_filtros[etapa_numero]
+        dataset = self.dataset
+        indices = self.historico_etapas.indices(etapa_numero)
+        medidor = self.medidor
+        
+        def gerar():
+            with medidor.medir("relatório: linhas da etapa", len(indices)):
+                df_final = dataset.linhas(indices).copy()
+            return self._montar_relatorio(etapa_numero, etapa, dataset, df_final, medidor)
+        return gerar
+    
+    def _cache_relatorios(self):
+        """Cache de relatórios com o limite de tamanho atual da configuração"""
+        self.relatorios.limite_bytes = self.desempenho_config.get('cache_relatorios_mb', 64) * 1024 * 1024
+        return self.relatorios
+    
+    def obter_relatorio(self, etapa_numero):
+        """Relatório (Excel, TXT) da etapa, reaproveitando o que já foi gerado"""
+        if not self.etapas_filtros or etapa_numero >= len(self.etapas_filtros):
+            return None, None
+        return self._cache_relatorios().obter(self._chave_relatorio(etapa_numero),
+                                              self._gerador_relatorio(etapa_numero))
+    
+    def relatorio_pronto(self, etapa_numero):
+        """Relatório da etapa se já estiver no cache, sem esperar nem gerar (None caso contrário)"""
+        if not self.etapas_filtros or etapa_numero >= len(self.etapas_filtros):
+            return None
+        return self.relatorios.pronto(self._chave_relatorio(etapa_numero))
+    
+    def pregerar_relatorios(self):
+        """Gerar em segundo plano os relatórios da melhor e da última etapa"""
+        if not self.etapas_filtros:
+            return
+        cache = self._cache_relatorios()
+        for posicao in dict.fromkeys([self.melhor_etapa, len(self.etapas_filtros) - 1]):
+            if posicao is not None:
+                cache.agendar(self._chave_relatorio(posicao), self._gerador_relatorio(posicao))
+    
+    def gerar_relatorio_excel(self, etapa_numero):
+        """Gerar relatório Excel para uma etapa específica"""
+        if not self.etapas_filtros or etapa_numero >= len(self.etapas_filtros):
+            return None, None
+        return self._gerador_relatorio(etapa_numero)()
+    
+    def grade_winrates(self, etapa_numero, max_limiares=60):
+        """Grade Winrate 1 × Winrate 2 da etapa: entradas, lucro e ROI de cada par de limiares.
+
+        Os limiares são aplicados sobre a etapa sem os seus próprios mínimos de
+        winrate (os demais filtros ficam). Cada eixo é amostrado em até
+        `max_limiares` valores para exibição; o melhor par é procurado na grade
+        inteira. ROI fica None nos pares abaixo do mínimo de entradas.
+        """
+        if not self.etapas_filtros or etapa_numero >= len(self.etapas_filtros):
+            return None
+        config = {**self.etapas_filtros[etapa_numero]['config'], 'w1': None, 'w2': None}
+        indices = self.dataset.filtrar(self.indices_filtrados, config)
+        limiares1, limiares2, lucros, entradas = somas_grade(self.dataset.winrate1[indices],
+                                                             self.dataset.winrate2[indices],
+                                                             self.dataset.lucro_exato[indices])
+        validos = entradas >= max(self.limite_minimo_apostas, 1)
+        roi = np.where(validos, lucros / np.maximum(entradas, 1), -np.inf)
+        i, j = np.unravel_index(np.argmax(roi), roi.shape)
+        melhor = None
+        if validos[i, j]:
+            melhor = {'w1': limiares1[i - 1] if i else None, 'w2': limiares2[j - 1] if j else None,
+                      'entradas': int(entradas[i, j]), 'lucro': float(lucros[i, j]), 'roi': float(roi[i, j])}
+
+        def amostrar(limiares):
+            # Posição 0 ("sem limiar") sempre entra; a tabela acumulada é exata em qualquer subconjunto
+            if len(limiares) <= max_limiares:
+                return np.arange(len(limiares) + 1)
+            return np.unique(np.concatenate(([0], np.linspace(1, len(limiares), max_limiares).round().astype(int))))
+
+        linhas, colunas = np.meshgrid(amostrar(limiares1), amostrar(limiares2), indexing='ij')
+        linhas, colunas = linhas.ravel(), colunas.ravel()
+        pontos = {
+            'w1': [limiares1[k - 1] if k else None for k in linhas],
+            'w2': [limiares2[k - 1] if k else None for k in colunas],
+            'entradas': entradas[linhas, colunas].tolist(),
+            'lucro': lucros[linhas, colunas].tolist(),
+            'roi': [float(r) if v else None for r, v in zip(roi[linhas, colunas], validos[linhas, colunas])],
+        }
+        return {'pontos': pontos, 'melhor': melhor}
+    
+    def _montar_relatorio(self, etapa_numero, etapa, dataset, df_final, medidor):
+        """Montar Excel e TXT de uma etapa a partir das linhas já materializadas"""
+        with medidor.medir("relatório: resumos por grupo", len(df_final)):
+            planilhas = self._planilhas_relatorio(dataset, df_final)
+
+        # Gravar o Excel já formatado, em uma única passada
+        with medidor.medir("relatório: escrita do Excel", len(df_final)):
+            excel_data = self._escrever_excel(planilhas)
+        
+        # Gerar arquivo TXT de configuração
+        config_texto = self._gerar_config_texto(etapa_numero, etapa, etapa['config'])
+        
+        return excel_data, config_texto
+    
+    def _planilhas_relatorio(self, dataset, df_final):
+        """Planilhas do relatório (nome, DataFrame) na ordem em que são gravadas"""
+        # Colunas de papel da tip, derivadas uma vez; as análises agrupadas saem do mesmo DataFrame
+        chaves = derivar_colunas(dataset, df_final)
+
+        df_confronto = resumir_grupos(df_final, "Confronto Normalizado")
+        if "Campeonato" in df_final.columns:
+            df_campeonato = resumir_grupos(df_final, "Campeonato")
+        df_winrate1 = resumir_grupos(df_final, "Winrate 1")
+        df_winrate2 = resumir_grupos(df_final, "Winrate 2")
+        df_jogador = resumir_grupos(df_final, chaves["Jogador Escolhido"], "Jogador")
+        df_jogador_contra = resumir_grupos(df_final, "Jogador Contra", "Jogador")
+        df_time = resumir_grupos(df_final, "Time a Favor", "Time")
+        df_time_contra = resumir_grupos(df_final, "Time Contra", "Time")
+
+        if "Favorito" in df_final.columns and "Azarão" in df_final.columns:
+            df_favorito = resumir_grupos(df_final, chaves["Favorito"])
+            df_azarao = resumir_grupos(df_final, chaves["Azarão"])
+            df_tipo = resumir_grupos(df_final, chaves["Tipo Aposta"])
+
+        df_local = resumir_grupos(df_final, "Tipo Local")
+        df_linha = resumir_grupos(df_final, "Linha")
+
+        if "Placar Envio" in df_final.columns:
+            df_placar_envio = resumir_grupos(df_final, "Placar Envio")
+            df_diferenca_placar = resumir_grupos(df_final, "Diferença Placar").sort_values("Diferença Placar")
+
+        # Planilhas na ordem do relatório
+        planilhas = [("Tips Enviadas", df_final), ("Confronto", df_confronto)]
+        if "Campeonato" in df_final.columns:
+            planilhas.append(("Campeonato", df_campeonato))
+        planilhas += [("Winrate 1", df_winrate1), ("Winrate 2", df_winrate2),
+                      ("Jogador", df_jogador), ("Jogador Contra", df_jogador_contra)]
+        if "Time A" in df_final.columns and "Time B" in df_final.columns:
+            planilhas += [("Time", df_time), ("Time Contra", df_time_contra)]
+        planilhas.append(("Linha", df_linha))
+        if "Placar Envio" in df_final.columns:
+            planilhas += [("Placar Envio", df_placar_envio), ("Diferença Placar", df_diferenca_placar)]
+        if "Favorito" in df_final.columns and "Azarão" in df_final.columns:
+            planilhas += [("Jogador Favorito", df_favorito), ("Jogador Azarão", df_azarao),
+                          ("Tipo Aposta", df_tipo)]
+        planilhas.append(("Tipo Local", df_local))
+        return planilhas
+    
+    def _escrever_excel(self, planilhas):
+        """Gravar as planilhas do relatório com tabelas, cores e fórmulas"""
+        return escrever_relatorio(planilhas)
+    
+    def _gerar_config_texto(self, etapa_numero, etapa, config_final):
+        """Gerar texto de configuração"""
+        config_table = [
+            ["Etapa Escolhida", etapa_numero],
+            ["Total de Apostas", etapa['entradas']],
+            ["ROI", f"{etapa['roi']:.3f}"],
+            ["Lucro Total", f"{etapa['lucro']:.2f}"],
+            ["Winrate 1 Mínimo", f"{config_final['w1']:.2f}%" if config_final['w1'] else "Nenhum"],
+            ["Winrate 2 Mínimo", f"{config_final['w2']:.2f}%" if config_final['w2'] else "Nenhum"],
+            ["Apostas a Favor Excluídas", ", ".join(config_final['apostas_a_favor_excl']) if config_final['apostas_a_favor_excl'] else "Nenhum"],
+            ["Apostas Contra Excluídas", ", ".join(config_final['apostas_contra_excl']) if config_final['apostas_contra_excl'] else "Nenhum"],
+            ["Confrontos Excluídos", ", ".join(config_final['confrontos']) if config_final['confrontos'] else "Nenhum"],
+            ["Campeonatos Excluídos", ", ".join(config_final['campeonatos_excl']) if config_final['campeonatos_excl'] else "Nenhum"],
+            ["Tipos de Aposta Excluídos", ", ".join(config_final['tipo_apostas_excl']) if config_final['tipo_apostas_excl'] else "Nenhum"],
+            ["Tipos de Local Excluídos", ", ".join(config_final['tipo_local_excl']) if config_final['tipo_local_excl'] else "Nenhum"],
+            ["Times a Favor Excluídos", ", ".join(config_final['times_a_favor_excl']) if config_final['times_a_favor_excl'] else "Nenhum"],
+            ["Times Contra Excluídos", ", ".join(config_final['times_contra_excl']) if config_final['times_contra_excl'] else "Nenhum"],
+            ["Diferença de Placar Mínima", str(config_final['diferenca_placar_min']) if config_final['diferenca_placar_min'] is not None else "Nenhum"],
+            ["Diferença de Placar Máxima", str(config_final['diferenca_placar_max']) if config_final['diferenca_placar_max'] is not None else "Nenhum"]
+        ]
+        
+        texto = "Configuração da Etapa Escolhida:\n"
+        texto += tabulate(config_table, headers=["Parâmetro", "Valor"], tablefmt="pretty")
+        texto += "\n\n"
+        
+        return texto
@@ -0,0 +1,125 @@
+"""Datasets compilados compartilhados por todas as sessões do processo.
+
+Cada arquivo (pelo hash do conteúdo) é lido e compilado uma única vez: as
+sessões recebem o mesmo `DatasetCompilado`, com os arrays somente leitura, e
+guardam só a própria seleção (índices) e os resultados. Cada sessão segura uma
+referência enquanto usa o dataset; acima do limite de memória, os datasets sem
+referências usados há mais tempo são descartados. Os que estão em uso nunca são
+descartados, então o total pode passar do limite enquanto forem usados.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .carga import carregar_dataset
+
+
+class _Entrada:
+    """Dataset (ainda sendo lido ou pronto), referências e memória ocupada"""
+
+    def __init__(self):
+        self.futuro = Future()
+        self.referencias = 0
+        self.bytes = 0
+
+
+class ArmazemDatasets:
+    """Datasets por hash do conteúdo, com contagem de referências e limite de `limite_bytes`"""
+
+    def __init__(self, limite_bytes, carregador=None):
+        self.limite_bytes = limite_bytes
+        # carregador(chave, conteudo, nome_arquivo) -> DatasetCompilado
+        self.carregador = carregador or (lambda chave, conteudo, nome_arquivo: carregar_dataset(conteudo, nome_arquivo, chave=chave))
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.descartes = 0
+
+    def __len__(self):
+        return len(self._itens)
+
+    def adquirir(self, chave, conteudo, nome_arquivo=None):
+        """Dataset do arquivo, lido só se ainda não estiver no armazém; conta uma referência.
+
+        Um pedido que chega enquanto o mesmo arquivo está sendo lido por outra
+        sessão espera por essa leitura em vez de repeti-la.
+        """
+        with self._trava:
+            entrada = self._itens.get(chave)
+            novo = entrada is None
+            if novo:
+                entrada = self._itens[chave] = _Entrada()
+                self.faltas += 1
+            else:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+            entrada.referencias += 1
+
+        if novo:
+            self._carregar(chave, entrada, conteudo, nome_arquivo)
+        try:
+            return entrada.futuro.result()
+        except BaseException:
+            with self._trava:
+                entrada.referencias -= 1
+            raise
+
+    def reter(self, chave):
+        """Contar mais uma referência a um dataset já pronto no armazém (False se ele não estiver lá)"""
+        with self._trava:
+            entrada = self._itens.get(chave)
+            if entrada is None or not entrada.futuro.done() or entrada.futuro.exception() is not None:
+                return False
+            entrada.referencias += 1
+            self._itens.move_to_end(chave)
+            return True
+
+    def liberar(self, chave):
+        """Devolver uma referência; o dataset sem referências pode ser descartado"""
+        with self._trava:
+            entrada = self._itens.get(chave)
+            if entrada is not None and entrada.referencias > 0:
+                entrada.referencias -= 1
+            self._descartar()
+
+    def estatisticas(self):
+        """Situação do armazém para quem opera o servidor"""
+        with self._trava:
+            return {
+                'datasets': len(self._itens),
+                'em_uso': sum(1 for entrada in self._itens.values() if entrada.referencias > 0),
+                'referencias': sum(entrada.referencias for entrada in self._itens.values()),
+                'bytes': sum(entrada.bytes for entrada in self._itens.values()),
+                'limite_bytes': self.limite_bytes,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'descartes': self.descartes,
+            }
+
+    def _carregar(self, chave, entrada, conteudo, nome_arquivo):
+        try:
+            dataset = self.carregador(chave, conteudo, nome_arquivo).compartilhar()
+            entrada.bytes = dataset.memoria()
+        except BaseException as e:
+            # Falhas não ficam no armazém: o próximo pedido tenta de novo
+            with self._trava:
+                if self._itens.get(chave) is entrada:
+                    del self._itens[chave]
+            entrada.futuro.set_exception(e)
+            return
+        entrada.futuro.set_result(dataset)
+        with self._trava:
+            self._descartar()
+
+    def _descartar(self):
+        """Remover os datasets prontos e sem referências, do usado há mais tempo, até caber no limite"""
+        total = sum(entrada.bytes for entrada in self._itens.values())
+        for chave, entrada in list(self._itens.items()):
+            if total <= self.limite_bytes:
+                break
+            if entrada.referencias == 0 and entrada.futuro.done():
+                del self._itens[chave]
+                total -= entrada.bytes
+                self.descartes += 1
@@ -0,0 +1,156 @@
+"""Benchmark das etapas da análise sobre planilhas sintéticas.
+
+Exemplo:
+    python -m backtest.benchmark --linhas 1000 10000 100000 --saida benchmark.json
+
+Para cada tamanho mede: leitura da planilha (e releitura pelo snapshot),
+filtrar_dados_iniciais, cada iteração da busca gulosa e cada família de
+candidatos, gerar_relatorio_excel e a escrita do xlsx, além das seções da
+medição do analisador (filtros, ROI, partes do relatório). O JSON gerado
+traz também versões e commit, para comparar execuções entre versões.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+
+from .analisador import BacktestAnalyzer
+from .carga import carregar_dataset
+from .sintetico import gerar_planilha
+
+TODOS = ("Todos os torneios", "Todos os campeonatos", "Ambos")
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _serializar_planilha(df, formato):
+    arquivo = io.BytesIO()
+    if formato == "csv":
+        df.to_csv(arquivo, index=False)
+    else:
+        df.to_excel(arquivo, index=False)
+    return arquivo.getvalue()
+
+
+def _novo_analyzer(config_file, diretorio_snapshots):
+    carregador = lambda chave, conteudo, nome_arquivo: carregar_dataset(  # noqa: E731
+        conteudo, nome_arquivo, chave=chave, diretorio_snapshots=diretorio_snapshots
+    )
+    return BacktestAnalyzer(carregador=carregador, config_file=config_file or "")
+
+
+def medir(linhas, formato="xlsx", semente=0, config_file=None, roi_desejado_pct=15.0):
+    """Tempos (em segundos) de cada etapa para uma planilha sintética de `linhas` linhas"""
+    tempos = {}
+
+    inicio = time.perf_counter()
+    conteudo = _serializar_planilha(gerar_planilha(linhas, semente), formato)
+    tempos["geracao"] = time.perf_counter() - inicio
+
+    with tempfile.TemporaryDirectory() as diretorio_snapshots:
+        arquivo = io.BytesIO(conteudo)
+        arquivo.name = f"benchmark.{formato}"
+
+        analyzer = _novo_analyzer(config_file, diretorio_snapshots)
+        inicio = time.perf_counter()
+        if not analyzer.carregar_arquivo(arquivo):
+            raise RuntimeError("Falha ao carregar a planilha sintética")
+        tempos["carga"] = time.perf_counter() - inicio
+
+        # Segunda carga, em um analisador novo, lê o snapshot gravado pela primeira
+        inicio = time.perf_counter()
+        _novo_analyzer(config_file, diretorio_snapshots).carregar_arquivo(arquivo)
+        tempos["carga_snapshot"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    analyzer.filtrar_dados_iniciais(*TODOS)
+    tempos["filtrar_dados_iniciais"] = time.perf_counter() - inicio
+
+    analyzer.desempenho_config['medir_desempenho'] = True
+    inicio = time.perf_counter()
+    sucesso, mensagem = analyzer.iniciar_analise(*TODOS, roi_desejado_pct)
+    tempos["busca_gulosa"] = time.perf_counter() - inicio
+    if not sucesso:
+        raise RuntimeError(mensagem)
+
+    # Escrita do xlsx medida à parte, embrulhando o método só nesta instância
+    escrita = analyzer._escrever_excel
+
+    def escrita_cronometrada(*args, **kwargs):
+        inicio_escrita = time.perf_counter()
+        resultado = escrita(*args, **kwargs)
+        tempos["escrever_excel"] = time.perf_counter() - inicio_escrita
+        return resultado
+
+    analyzer._escrever_excel = escrita_cronometrada
+    inicio = time.perf_counter()
+    analyzer.gerar_relatorio_excel(analyzer.melhor_etapa)
+    tempos["gerar_relatorio_excel"] = time.perf_counter() - inicio
+
+    familias = {}
+    for perfil in analyzer.perfil_etapas:
+        for familia, segundos in perfil["familias"].items():
+            familias[familia] = familias.get(familia, 0.0) + segundos
+
+    return {
+        "linhas": linhas,
+        "formato": formato,
+        "semente": semente,
+        "etapas": len(analyzer.etapas_filtros),
+        "entradas_melhor_etapa": analyzer.etapas_filtros[analyzer.melhor_etapa]["entradas"],
+        "tempos": tempos,
+        "familias": familias,
+        "secoes": analyzer.medidor.resumo(),
+        "iteracoes": analyzer.perfil_etapas,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da análise do Handicap/ML Pro")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Tamanhos das planilhas sintéticas")
+    parser.add_argument("--formato", choices=["xlsx", "csv"], default="xlsx")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--config", help="JSON de configuração da busca (padrão: configurações padrão)")
+    parser.add_argument("--saida", default="benchmark.json", help="Arquivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    resultados = []
+    for linhas in args.linhas:
+        resultado = medir(linhas, args.formato, args.semente, args.config)
+        resultados.append(resultado)
+        print(f"\n{linhas:,} linhas — {resultado['etapas']} etapas")
+        print(tabulate(sorted(resultado["tempos"].items()), headers=["Etapa", "Segundos"], floatfmt=".3f"))
+
+    relatorio = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "resultados": resultados,
+    }
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Cache dos relatórios (Excel, TXT) já gerados por etapa.
+
+Cada entrada guarda um Future: um pedido que chega enquanto o mesmo relatório
+está sendo gerado (por exemplo, em segundo plano) espera por ele em vez de
+gerá-lo de novo. Acima do limite de bytes, os relatórios usados há mais tempo
+são descartados.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+def tamanho_relatorio(relatorio):
+    """Bytes ocupados por um relatório (Excel, TXT)"""
+    return sum(len(parte) for parte in relatorio if parte)
+
+
+class CacheRelatorios:
+    """Relatórios por chave, com descarte do menos usado acima de `limite_bytes`"""
+
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+        self._executor = None
+
+    def __len__(self):
+        return len(self._itens)
+
+    def obter(self, chave, gerar):
+        """Relatório da chave, chamando `gerar()` apenas se ele ainda não existir"""
+        with self._trava:
+            futuro = self._itens.get(chave)
+            novo = futuro is None
+            if novo:
+                futuro = self._itens[chave] = Future()
+            else:
+                self._itens.move_to_end(chave)
+        if novo:
+            self._executar(chave, futuro, gerar)
+        return futuro.result()
+
+    def pronto(self, chave):
+        """Relatório da chave se já estiver gerado, sem esperar nem gerar"""
+        with self._trava:
+            futuro = self._itens.get(chave)
+            if futuro is None or not futuro.done() or futuro.exception() is not None:
+                return None
+            self._itens.move_to_end(chave)
+            return futuro.result()
+
+    def agendar(self, chave, gerar):
+        """Gerar o relatório em segundo plano, se a chave ainda não estiver no cache"""
+        with self._trava:
+            if chave in self._itens:
+                return
+            futuro = self._itens[chave] = Future()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="relatorios")
+        self._executor.submit(self._executar, chave, futuro, gerar)
+
+    def _executar(self, chave, futuro, gerar):
+        try:
+            relatorio = gerar()
+        except BaseException as e:
+            # Falhas não ficam no cache: o próximo pedido tenta de novo
+            with self._trava:
+                if self._itens.get(chave) is futuro:
+                    del self._itens[chave]
+            futuro.set_exception(e)
+            return
+        futuro.set_result(relatorio)
+        with self._trava:
+            self._descartar()
+
+    def _descartar(self):
+        """Remover os relatórios prontos menos usados até caber no limite (o mais recente fica)"""
+        prontos = [(chave, tamanho_relatorio(futuro.result())) for chave, futuro in self._itens.items()
+                   if futuro.done() and futuro.exception() is None]
+        total = sum(tamanho for _, tamanho in prontos)
+        for chave, tamanho in prontos[:-1]:
+            if total <= self.limite_bytes:
+                break
+            del self._itens[chave]
+            total -= tamanho
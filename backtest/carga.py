@@ -0,0 +1,212 @@
+"""Leitura da planilha enviada e montagem do dataset compilado.
+
+Planilhas .xlsx são lidas em streaming (openpyxl em modo somente leitura), só
+com as colunas que a análise usa e em lotes de `TAMANHO_LOTE` linhas já
+tipados: colunas extras e linhas inteiras da planilha nunca ficam todas na
+memória. Os valores saem como os do `pd.read_excel` (células vazias, erros e
+textos como "NA" viram nulos; colunas só de números viram numéricas). CSV e
+.xls são lidos inteiros e reduzidos às mesmas colunas.
+"""
+
+import csv
+import hashlib
+import io
+import time
+import zipfile
+from operator import itemgetter
+
+import chardet
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+
+from .dataset import DatasetCompilado
+from .snapshot import ler_snapshot, salvar_snapshot
+
+COLUNAS_OBRIGATORIAS = ["Torneio", "Jogador A", "Jogador B", "Tip", "Lucro/Prej.", "Winrate 1", "Winrate 2"]
+COLUNAS_OPCIONAIS = ["Campeonato", "Time A", "Time B", "Favorito", "Azarão", "Placar Envio", "Linha", "Resultado",
+                     "Confronto"]
+COLUNAS_CONHECIDAS = COLUNAS_OBRIGATORIAS + COLUNAS_OPCIONAIS
+# Tipadas por tipar_colunas; as demais ficam com o tipo que os valores da coluna inteira indicarem
+COLUNAS_NUMERICAS = ("Winrate 1", "Winrate 2", "Lucro/Prej.")
+
+# Linhas da planilha convertidas de cada vez na leitura em streaming
+TAMANHO_LOTE = 50_000
+
+# Textos lidos como nulos, como no pd.read_excel (valores padrão de na_values), e erros de fórmula
+VALORES_NULOS = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                 "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null", *ERROR_CODES}
+
+
+class ColunasAusentesError(ValueError):
+    """A planilha não possui alguma das colunas obrigatórias"""
+
+
+def hash_conteudo(conteudo):
+    """Chave de cache do arquivo: SHA-256 dos bytes enviados"""
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def ler_csv(conteudo):
+    """Ler um CSV detectando encoding e separador (';' implica vírgula decimal)"""
+    encoding = chardet.detect(conteudo[:100000])['encoding'] or 'utf-8'
+    amostra = conteudo[:20000].decode(encoding, errors='ignore')
+    try:
+        separador = csv.Sniffer().sniff(amostra, delimiters=";,\t").delimiter
+    except csv.Error:
+        separador = ','
+    decimal = ',' if separador == ';' else '.'
+    return pd.read_csv(io.BytesIO(conteudo), sep=separador, decimal=decimal, encoding=encoding)
+
+
+def verificar_colunas(colunas):
+    """Erro se faltar alguma coluna obrigatória"""
+    missing_columns = [col for col in COLUNAS_OBRIGATORIAS if col not in colunas]
+    if missing_columns:
+        raise ColunasAusentesError(f"Colunas não encontradas: {', '.join(missing_columns)}")
+
+
+def tipar_colunas(df):
+    """Converter Winrate 1/2 e Lucro/Prej. em números (na planilha inteira ou em um lote)"""
+    if "Winrate 1" in df.columns:
+        df["Winrate 1"] = pd.to_numeric(
+            df["Winrate 1"].astype(str).str.replace('%', '').str.replace(',', '.'),
+            errors="coerce"
+        )
+    if "Winrate 2" in df.columns:
+        df["Winrate 2"] = pd.to_numeric(
+            df["Winrate 2"].astype(str).str.replace('%', '').str.replace(',', '.'),
+            errors="coerce"
+        )
+    if "Lucro/Prej." in df.columns:
+        df["Lucro/Prej."] = pd.to_numeric(df["Lucro/Prej."], errors="coerce").fillna(0)
+    return df
+
+
+def _valores_lote(valores, numerica):
+    """Valores de uma coluna do lote, com nulos no lugar de vazios, erros e textos nulos"""
+    valores = np.array(valores, dtype=object)
+    serie = pd.Series(valores, dtype=object)
+    valores[(serie.isna() | serie.isin(VALORES_NULOS)).to_numpy()] = np.nan
+    if not numerica:
+        # Números inteiros gravados como decimal voltam a ser inteiros, como no pd.read_excel
+        decimais = np.flatnonzero([type(valor) is float and valor.is_integer() for valor in valores])
+        for indice in decimais:
+            valores[indice] = int(valores[indice])
+    return valores
+
+
+def _tipar_coluna(valores):
+    """Coluna final a partir dos valores de todos os lotes: numérica se todos os valores forem números"""
+    serie = pd.Series(valores)
+    if pd.api.types.is_string_dtype(serie.dtype):
+        try:
+            return pd.to_numeric(serie)
+        except (ValueError, TypeError):
+            pass
+    return serie
+
+
+def _fechar_lote(linhas, nomes):
+    """Colunas de um lote de linhas já projetadas: as numéricas tipadas, as de texto compactas e as demais brutas"""
+    lote = pd.DataFrame({nome: _valores_lote(valores, nome in COLUNAS_NUMERICAS)
+                         for nome, valores in zip(nomes, zip(*linhas))}, dtype=object)
+    tipar_colunas(lote)
+    colunas = {}
+    for nome in nomes:
+        if nome in COLUNAS_NUMERICAS:
+            colunas[nome] = lote[nome]
+        elif pd.api.types.infer_dtype(lote[nome], skipna=True) == "string":
+            # Só textos: já no tipo de texto compacto do pandas, sem um objeto Python por célula
+            colunas[nome] = pd.Series(lote[nome].to_numpy(), dtype="str")
+        else:
+            colunas[nome] = lote[nome].to_numpy()
+    return colunas
+
+
+def ler_excel(conteudo, tamanho_lote=TAMANHO_LOTE):
+    """Ler a primeira planilha do .xlsx em streaming, só com as colunas conhecidas"""
+    livro = load_workbook(io.BytesIO(conteudo), read_only=True, data_only=True)
+    try:
+        planilha = livro.worksheets[0]
+        planilha.reset_dimensions()
+        linhas = planilha.iter_rows(values_only=True)
+
+        # Primeira ocorrência de cada coluna conhecida no cabeçalho
+        posicoes = {}
+        for posicao, nome in enumerate(next(linhas, ())):
+            if isinstance(nome, str) and nome in COLUNAS_CONHECIDAS and nome not in posicoes:
+                posicoes[nome] = posicao
+        verificar_colunas(posicoes)
+
+        # Cada linha é reduzida às colunas conhecidas assim que é lida
+        projetar = itemgetter(*posicoes.values())
+        largura = max(posicoes.values()) + 1
+        vazia = (None,) * len(posicoes)
+        lotes = []
+        lote = []
+        vazias = 0
+        for linha in linhas:
+            # Linhas vazias no meio ficam (como nulos); as do fim da planilha são descartadas
+            if linha.count(None) + linha.count("") == len(linha):
+                vazias += 1
+                continue
+            lote.extend([vazia] * vazias)
+            vazias = 0
+            # As linhas do modo somente leitura terminam na última célula preenchida
+            if len(linha) < largura:
+                linha += (None,) * (largura - len(linha))
+            lote.append(projetar(linha))
+            if len(lote) >= tamanho_lote:
+                lotes.append(_fechar_lote(lote, list(posicoes)))
+                lote = []
+        if lote:
+            lotes.append(_fechar_lote(lote, list(posicoes)))
+    finally:
+        livro.close()
+
+    colunas = {}
+    for nome in posicoes:
+        partes = [parte[nome] for parte in lotes]
+        if nome in COLUNAS_NUMERICAS:
+            colunas[nome] = pd.concat(partes, ignore_index=True) if partes else pd.Series(dtype=float)
+        elif partes and all(isinstance(parte, pd.Series) for parte in partes):
+            colunas[nome] = _tipar_coluna(pd.concat(partes, ignore_index=True))
+        else:
+            colunas[nome] = _tipar_coluna(np.concatenate([np.asarray(parte, dtype=object) for parte in partes])
+                                          if partes else np.array([], dtype=object))
+    return pd.DataFrame(colunas)
+
+
+def ler_planilha(conteudo, nome_arquivo=None):
+    """Ler a planilha (Excel ou CSV) só com as colunas conhecidas e tipar as colunas numéricas"""
+    if nome_arquivo and nome_arquivo.lower().endswith('.csv'):
+        df = tipar_colunas(ler_csv(conteudo))
+    elif zipfile.is_zipfile(io.BytesIO(conteudo)):
+        return ler_excel(conteudo)
+    else:
+        # .xls antigo: sem leitura em streaming, lido inteiro pelo pandas
+        df = tipar_colunas(pd.read_excel(io.BytesIO(conteudo)))
+
+    verificar_colunas(df.columns)
+    return df[[col for col in df.columns if col in COLUNAS_CONHECIDAS]].reset_index(drop=True)
+
+
+def carregar_dataset(conteudo, nome_arquivo=None, chave=None, diretorio_snapshots=None):
+    """Dataset compilado do arquivo, usando o snapshot em disco quando existir"""
+    inicio = time.perf_counter()
+    chave = chave or hash_conteudo(conteudo)
+
+    df = ler_snapshot(chave, diretorio_snapshots)
+    origem = "snapshot"
+    if df is None:
+        df = ler_planilha(conteudo, nome_arquivo)
+        salvar_snapshot(df, chave, diretorio_snapshots)
+        origem = "csv" if nome_arquivo and nome_arquivo.lower().endswith('.csv') else "excel"
+
+    dataset = DatasetCompilado(df)
+    dataset.chave = chave
+    dataset.origem = origem
+    dataset.tempo_leitura = time.perf_counter() - inicio
+    return dataset
@@ -0,0 +1,112 @@
+"""Estado salvo de buscas interrompidas, gravado em disco.
+
+Um checkpoint guarda tudo o que a busca precisa para continuar (configuração,
+etapas, linhas de cada estado) e é identificado pelo arquivo, pela seleção e
+pelas configurações da busca, para que outra sessão com o mesmo upload possa
+retomá-lo. As somas por grupo não são gravadas: são remontadas exatamente a
+partir das linhas salvas.
+
+O estado (configurações, passos, perfil) vai em JSON e as linhas em um .npz
+ao lado, lido sem pickle. O JSON guarda a versão do formato, o hash do arquivo
+analisado e o hash do .npz; um checkpoint que não confere é ignorado.
+"""
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+DIRETORIO_CHECKPOINTS = os.environ.get("HANDICAP_CHECKPOINTS", ".checkpoints")
+VERSAO_CHECKPOINT = 2
+
+
+def chave_checkpoint(*partes):
+    """Identificação do checkpoint a partir de partes serializáveis em JSON"""
+    texto = json.dumps(partes, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def caminho_checkpoint(chave, diretorio=None):
+    """Arquivo JSON do checkpoint (as linhas ficam no .npz de mesmo nome)"""
+    return os.path.join(diretorio or DIRETORIO_CHECKPOINTS, f"{chave}.json")
+
+
+def _caminho_linhas(chave, diretorio=None):
+    return os.path.join(diretorio or DIRETORIO_CHECKPOINTS, f"{chave}.npz")
+
+
+def _para_json(valor):
+    """Escalares e arrays do numpy como tipos do Python"""
+    if isinstance(valor, (np.generic, np.ndarray)):
+        return valor.tolist()
+    raise TypeError(f"Valor não serializável no checkpoint: {type(valor).__name__}")
+
+
+def _gravar(destino, conteudo):
+    """Gravar `conteudo` (bytes) por um arquivo temporário, trocando o destino de uma vez"""
+    descritor, temporario = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(destino))
+    try:
+        with os.fdopen(descritor, "wb") as f:
+            f.write(conteudo)
+        os.replace(temporario, destino)
+    except OSError:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+
+
+def salvar_checkpoint(chave, estado, linhas, hash_arquivo, diretorio=None):
+    """Gravar o estado (JSON) e as linhas (arrays) da busca; falhas de escrita não interrompem a análise"""
+    destino = caminho_checkpoint(chave, diretorio)
+    try:
+        buffer = io.BytesIO()
+        np.savez(buffer, **linhas)
+        conteudo_linhas = buffer.getvalue()
+        texto = json.dumps({
+            "versao": VERSAO_CHECKPOINT,
+            "arquivo": hash_arquivo,
+            "linhas": hashlib.sha256(conteudo_linhas).hexdigest(),
+            "estado": estado,
+        }, default=_para_json, ensure_ascii=False)
+
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        # As linhas antes do JSON: um JSON gravado sempre aponta para linhas completas
+        _gravar(_caminho_linhas(chave, diretorio), conteudo_linhas)
+        _gravar(destino, texto.encode("utf-8"))
+    except (OSError, TypeError, ValueError):
+        return None
+    return destino
+
+
+def ler_checkpoint(chave, hash_arquivo, diretorio=None):
+    """(estado, linhas) salvos da busca, ou None se não houver um válido para esta versão e este arquivo"""
+    try:
+        with open(caminho_checkpoint(chave, diretorio), "rb") as f:
+            dados = json.loads(f.read().decode("utf-8"))
+        if (not isinstance(dados, dict) or dados.get("versao") != VERSAO_CHECKPOINT
+                or dados.get("arquivo") != hash_arquivo):
+            return None
+        with open(_caminho_linhas(chave, diretorio), "rb") as f:
+            conteudo_linhas = f.read()
+        if hashlib.sha256(conteudo_linhas).hexdigest() != dados.get("linhas"):
+            return None
+        with np.load(io.BytesIO(conteudo_linhas), allow_pickle=False) as arquivo:
+            linhas = {nome: arquivo[nome] for nome in arquivo.files}
+        return dados["estado"], linhas
+    except (OSError, UnicodeDecodeError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+def remover_checkpoint(chave, diretorio=None):
+    """Apagar o checkpoint de uma busca concluída (ou inválido)"""
+    for caminho in (caminho_checkpoint(chave, diretorio), _caminho_linhas(chave, diretorio)):
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
@@ -0,0 +1,208 @@
+"""Execução em lote da busca pela linha de comando, sem Streamlit.
+
+Exemplo:
+    python -m backtest.cli planilha.xlsx --config busca_config_streamlit.json --saida resultados
+
+Sem `--grade`, roda todas as combinações Torneio × Campeonato × Tip da planilha.
+A grade em JSON é uma lista de objetos com as chaves "torneio", "campeonato" e "tip".
+
+As seleções são distribuídas entre `--processos` processos (padrão: um por núcleo).
+A carga inicial grava os arrays do dataset compilado junto ao snapshot da planilha,
+e cada processo recebe só a pasta do snapshot: os arrays são mapeados em memória
+somente leitura, então os processos dividem as mesmas páginas em vez de ter cada
+um a sua cópia do dataset.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from tqdm import tqdm
+
+from .analisador import BacktestAnalyzer
+from .progresso import ReporterProgresso
+from .snapshot import abrir_compilado, salvar_compilado
+
+TODOS_TORNEIOS = "Todos os torneios"
+TODOS_CAMPEONATOS = "Todos os campeonatos"
+
+
+class ReporterTerminal(ReporterProgresso):
+    """Erros vão para o stderr; o progresso de cada busca é omitido"""
+
+    def erro(self, mensagem):
+        tqdm.write(mensagem, file=sys.stderr)
+
+
+def montar_grade(analyzer):
+    """Todas as seleções possíveis, como no formulário da interface"""
+    grade = []
+    for torneio in analyzer.obter_opcoes_formulario().get('torneios', []):
+        for campeonato in analyzer.obter_campeonatos(torneio):
+            tips = analyzer.obter_tips_disponiveis(torneio, campeonato) or [None]
+            grade.extend((torneio, campeonato, tip) for tip in tips)
+    return grade
+
+
+def ler_grade(caminho):
+    """Seleções de um arquivo JSON"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        itens = json.load(f)
+    return [
+        (item.get('torneio', TODOS_TORNEIOS), item.get('campeonato', TODOS_CAMPEONATOS), item.get('tip'))
+        for item in itens
+    ]
+
+
+def nome_pasta(numero, selecao):
+    """Nome de pasta seguro para uma seleção"""
+    partes = [str(parte) for parte in selecao if parte is not None]
+    return f"{numero:03d}_" + re.sub(r'[^\w.-]+', '_', "_".join(partes)).strip('_')
+
+
+def tabela_etapas(etapas):
+    """Tabela de etapas no mesmo formato da interface"""
+    return pd.DataFrame([{
+        'Etapa': etapa['numero'],
+        'Ajuste Aplicado': etapa['ajuste'],
+        'Apostas': etapa['entradas'],
+        'Lucro': etapa['lucro'],
+        'ROI': etapa['roi'],
+    } for etapa in etapas])
+
+
+def gravar_relatorio(analyzer, posicao, pasta):
+    excel_data, txt_data = analyzer.gerar_relatorio_excel(posicao)
+    if excel_data is None:
+        return
+    with open(os.path.join(pasta, f"Analise_Handicap_Etapa_{posicao}.xlsx"), 'wb') as f:
+        f.write(excel_data)
+    with open(os.path.join(pasta, f"Config_Etapa_{posicao}.txt"), 'w', encoding='utf-8') as f:
+        f.write(txt_data)
+
+
+def executar_selecao(analyzer, selecao, roi_desejado_pct, pasta, todas_etapas=False):
+    """Rodar a busca de uma seleção e gravar etapas e relatórios em `pasta`"""
+    torneio, campeonato, tip = selecao
+    resumo = {'Torneio': torneio, 'Campeonato': campeonato, 'Tip': tip or "Ambos"}
+
+    sucesso, mensagem = analyzer.iniciar_analise(torneio, campeonato, tip, roi_desejado_pct)
+    resumo['Mensagem'] = mensagem
+    if not sucesso:
+        return resumo
+
+    os.makedirs(pasta, exist_ok=True)
+    tabela_etapas(analyzer.etapas_filtros).to_csv(os.path.join(pasta, "etapas.csv"), index=False)
+
+    posicoes = range(len(analyzer.etapas_filtros)) if todas_etapas else [analyzer.melhor_etapa]
+    for posicao in posicoes:
+        gravar_relatorio(analyzer, posicao, pasta)
+
+    melhor = analyzer.etapas_filtros[analyzer.melhor_etapa]
+    resumo.update({
+        'Pasta': os.path.basename(pasta),
+        'Apostas Iniciais': analyzer.total_inicial_apostas,
+        'ROI Inicial': analyzer.roi_inicial,
+        'Etapas': len(analyzer.etapas_filtros),
+        'Melhor Etapa': melhor['numero'],
+        'Apostas': melhor['entradas'],
+        'Lucro': melhor['lucro'],
+        'ROI': melhor['roi'],
+    })
+    return resumo
+
+
+# Analisador de cada processo do pool, criado uma vez em _inicializar_processo
+_analyzer_processo = None
+
+
+def _inicializar_processo(snapshot, planilha, config_file):
+    global _analyzer_processo
+    _analyzer_processo = BacktestAnalyzer(reporter=ReporterTerminal(), config_file=config_file)
+    dataset = abrir_compilado(snapshot) if snapshot is not None else None
+    if dataset is not None:
+        _analyzer_processo.usar_dataset(dataset)
+    else:
+        # Sem snapshot gravado (pasta sem escrita, por exemplo): cada processo lê a planilha
+        _analyzer_processo.carregar_arquivo(planilha)
+
+
+def _executar_no_processo(selecao, roi_desejado_pct, pasta, todas_etapas):
+    return executar_selecao(_analyzer_processo, selecao, roi_desejado_pct, pasta, todas_etapas)
+
+
+def _resumo_com_erro(selecao, erro):
+    torneio, campeonato, tip = selecao
+    return {'Torneio': torneio, 'Campeonato': campeonato, 'Tip': tip or "Ambos", 'Mensagem': f"Erro: {erro}"}
+
+
+def executar_grade(analyzer, args, grade, processos):
+    """Rodar todas as seleções, entregando (posição, resumo) à medida que terminam"""
+    tarefas = [
+        (numero, selecao, os.path.join(args.saida, nome_pasta(numero, selecao)))
+        for numero, selecao in enumerate(grade, start=1)
+    ]
+
+    if processos <= 1 or len(tarefas) <= 1:
+        for numero, selecao, pasta in tarefas:
+            try:
+                yield numero, executar_selecao(analyzer, selecao, args.roi, pasta, args.todas_etapas)
+            except Exception as e:
+                yield numero, _resumo_com_erro(selecao, e)
+        return
+
+    snapshot = salvar_compilado(analyzer.dataset)
+    with ProcessPoolExecutor(max_workers=min(processos, len(tarefas)), initializer=_inicializar_processo,
+                             initargs=(snapshot, args.planilha, args.config)) as executor:
+        futuros = {
+            executor.submit(_executar_no_processo, selecao, args.roi, pasta, args.todas_etapas): (numero, selecao)
+            for numero, selecao, pasta in tarefas
+        }
+        for futuro in as_completed(futuros):
+            numero, selecao = futuros[futuro]
+            try:
+                yield numero, futuro.result()
+            except Exception as e:
+                yield numero, _resumo_com_erro(selecao, e)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busca gulosa do Handicap/ML Pro em lote")
+    parser.add_argument("planilha", help="Arquivo Excel (.xlsx/.xls) ou CSV")
+    parser.add_argument("--config", default="busca_config_streamlit.json",
+                        help="JSON com busca_config e min_entradas_config (mesmo formato da interface)")
+    parser.add_argument("--grade", help="JSON com as seleções; por padrão, todas as combinações")
+    parser.add_argument("--saida", default="resultados", help="Pasta de saída")
+    parser.add_argument("--roi", type=float, default=15.0, help="ROI desejado (%%)")
+    parser.add_argument("--todas-etapas", action="store_true",
+                        help="Gerar relatório de todas as etapas, não só da melhor")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1,
+                        help="Processos em paralelo (padrão: número de núcleos)")
+    args = parser.parse_args(argv)
+
+    analyzer = BacktestAnalyzer(reporter=ReporterTerminal(), config_file=args.config)
+    if not analyzer.carregar_arquivo(args.planilha):
+        return 1
+
+    grade = ler_grade(args.grade) if args.grade else montar_grade(analyzer)
+    os.makedirs(args.saida, exist_ok=True)
+
+    resumos = {}
+    progresso = tqdm(total=len(grade), desc="Seleções", unit="busca")
+    for numero, resumo in executar_grade(analyzer, args, grade, args.processos):
+        resumos[numero] = resumo
+        progresso.update(1)
+    progresso.close()
+
+    pd.DataFrame([resumos[numero] for numero in sorted(resumos)]).to_csv(
+        os.path.join(args.saida, "resumo.csv"), index=False
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""Orçamento e interrupção de uma busca em andamento.
+
+A busca consulta o controle entre as etapas: ele para por pedido de pausa
+(de outra thread), por tempo ou por quantidade de candidatos avaliados.
+Os orçamentos valem para cada execução: uma busca retomada recebe um controle novo.
+"""
+
+import threading
+import time
+
+PAUSA = "pausa"
+TEMPO = "tempo"
+AVALIACOES = "avaliações"
+
+
+class ControleBusca:
+    """Limites de tempo (s) e de candidatos avaliados (0 = sem limite) e pedido de pausa"""
+
+    def __init__(self, tempo_limite=0, max_avaliacoes=0):
+        self.tempo_limite = float(tempo_limite or 0)
+        self.max_avaliacoes = int(max_avaliacoes or 0)
+        self.avaliacoes = 0
+        self._inicio = time.perf_counter()
+        self._fim = None
+        self._pausa = threading.Event()
+
+    def tempo_decorrido(self):
+        return (self._fim or time.perf_counter()) - self._inicio
+
+    def encerrar(self):
+        """Marcar o fim da execução (o tempo decorrido para de contar)"""
+        self._fim = time.perf_counter()
+
+    def contar(self, quantidade):
+        """Registrar `quantidade` candidatos avaliados"""
+        self.avaliacoes += quantidade
+
+    def pausar(self):
+        """Pedir que a busca pare na próxima verificação (seguro para outra thread)"""
+        self._pausa.set()
+
+    def motivo_parada(self):
+        """Motivo para parar agora (PAUSA, TEMPO, AVALIACOES) ou None para continuar"""
+        if self._pausa.is_set():
+            return PAUSA
+        if self.tempo_limite and self.tempo_decorrido() >= self.tempo_limite:
+            return TEMPO
+        if self.max_avaliacoes and self.avaliacoes >= self.max_avaliacoes:
+            return AVALIACOES
+        return None
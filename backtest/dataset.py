@@ -0,0 +1,340 @@
+"""Dataset compilado da planilha do TipManager.
+
+Construído uma única vez no upload: as colunas categóricas são fatorizadas em
+códigos inteiros de um vocabulário compartilhado, de modo que comparações como
+`Tip == Jogador A` ou `isin(campeonatos_excl)` viram operações sobre inteiros.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from .selecao import IndiceSelecao
+
+COLUNAS_CODIFICADAS = ["Torneio", "Campeonato", "Jogador A", "Jogador B", "Time A", "Time B",
+                       "Tip", "Favorito", "Azarão", "Confronto"]
+
+# Código das células vazias e de valores que não existem no vocabulário
+NULO = -1
+AUSENTE = -2
+
+# "gols-gols" aceitando o que int() aceita em cada lado (espaços, sinal +, "_" entre dígitos)
+PADRAO_PLACAR = re.compile(r'^\s*\+?(\d+(?:_\d+)*)\s*-\s*\+?(\d+(?:_\d+)*)\s*\Z')
+
+
+def calcular_diferenca_placar(placar):
+    """Calcular diferença entre placares"""
+    try:
+        if pd.isna(placar) or placar is None or not isinstance(placar, str):
+            return None
+        if '-' not in placar:
+            return None
+
+        partes = placar.split('-')
+        if len(partes) != 2:
+            return None
+
+        try:
+            num1 = int(partes[0])
+            num2 = int(partes[1])
+            diferenca = abs(num1 - num2)
+            return diferenca
+        except (ValueError, TypeError):
+            return None
+    except Exception:
+        return None
+
+
+def separar_placar(placar):
+    """Gols de cada lado e diferença absoluta do "Placar Envio", como inteiros anuláveis (Int64).
+
+    Vale <NA> onde calcular_diferenca_placar retornaria None: células vazias,
+    valores que não são texto e textos fora do formato "gols-gols".
+    """
+    # Os placares se repetem muito: o formato é verificado só nos valores distintos
+    codigos, unicos = pd.factorize(placar.to_numpy(dtype=object))
+    textos = pd.Series(unicos, dtype=object)
+    try:
+        partes = textos.str.extract(PADRAO_PLACAR)
+    except AttributeError:
+        # Nenhum texto na coluna
+        partes = pd.DataFrame(np.nan, index=textos.index, columns=[0, 1], dtype=object)
+
+    gols = []
+    for lado in (0, 1):
+        por_valor = pd.array([int(texto) if isinstance(texto, str) else None for texto in partes[lado]], dtype="Int64")
+        gols.append(pd.Series(por_valor.take(codigos, allow_fill=True), index=placar.index))
+    return pd.DataFrame({"Gols A": gols[0], "Gols B": gols[1], "Diferença Placar": (gols[0] - gols[1]).abs()})
+
+
+def montar_confronto(df):
+    """Coluna "Jogador A vs Jogador B", vazia quando falta algum jogador"""
+    validos = (df["Jogador A"].notna() & df["Jogador B"].notna()).to_numpy()
+    confronto = (df["Jogador A"].astype(str) + " vs " + df["Jogador B"].astype(str)).to_numpy(dtype=object)
+    return np.where(validos, confronto, "")
+
+
+class DatasetCompilado:
+    """Representação colunar e codificada da planilha carregada"""
+
+    def __init__(self, df):
+        if 'Confronto' not in df.columns:
+            df['Confronto'] = montar_confronto(df)
+
+        self.df = df
+        self.total = len(df)
+        self.chave = None
+        self.origem = None
+        self.tempo_leitura = None
+        self.colunas = [col for col in COLUNAS_CODIFICADAS if col in df.columns]
+
+        # Vocabulário único e ordenado: a ordem dos códigos é a ordem dos valores
+        valores = np.concatenate([df[col].to_numpy(dtype=object) for col in self.colunas])
+        try:
+            codigos, vocabulario = pd.factorize(valores, sort=True)
+        except TypeError:
+            codigos, vocabulario = pd.factorize(valores)
+        self.vocabulario = np.asarray(vocabulario, dtype=object)
+        self._posicoes = {valor: codigo for codigo, valor in enumerate(self.vocabulario)}
+        self.codigos = {
+            col: codigos[i * self.total:(i + 1) * self.total].astype(np.int32)
+            for i, col in enumerate(self.colunas)
+        }
+
+        # Textos repetidos passam a apontar para o mesmo objeto do vocabulário
+        for col in self.colunas:
+            if pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+                df[col] = self.decodificar(self.codigos[col], vazio=np.nan)
+
+        # Papéis da tip em cada linha
+        self.tip_a = self._iguais('Tip', 'Jogador A')
+        self.tip_b = self._iguais('Tip', 'Jogador B')
+        self.tip_favorito = self._iguais('Tip', 'Favorito')
+        self.tip_azarao = self._iguais('Tip', 'Azarão')
+        self.tem_times = 'Time A' in self.codigos and 'Time B' in self.codigos
+        self.tem_tipo_aposta = 'Favorito' in self.codigos and 'Azarão' in self.codigos
+
+        self.winrate1 = df['Winrate 1'].to_numpy(dtype=float)
+        self.winrate2 = df['Winrate 2'].to_numpy(dtype=float)
+        self.lucro = df['Lucro/Prej.'].to_numpy(dtype=np.float32)
+        self.lucro_exato = df['Lucro/Prej.'].to_numpy(dtype=float)
+
+        self._chaves_grupos = None
+        self._codigos_grupos = None
+        self._indice_selecao = None
+
+        # Placar separado uma vez na carga; a diferença fica como float (NaN = inválido)
+        self.diferenca_placar = None
+        if "Placar Envio" in df.columns:
+            placar = separar_placar(df["Placar Envio"])
+            self.diferenca_placar = placar["Diferença Placar"].to_numpy(dtype=float, na_value=np.nan)
+
+    def _iguais(self, col_a, col_b):
+        if col_a not in self.codigos or col_b not in self.codigos:
+            return np.zeros(self.total, dtype=bool)
+        codigos_a = self.codigos[col_a]
+        return (codigos_a == self.codigos[col_b]) & (codigos_a != NULO)
+
+    def chaves_grupos(self):
+        """Chave de grupo de cada linha em cada visão usada pela busca (NULO = fora do grupo).
+
+        Calculadas uma vez por dataset: `jogador_favor_a` é o código do Jogador A
+        nas linhas com tip nele, `*_ambos` marca as linhas que casam pelos dois lados
+        e as visões de tipo ("Favorito", "Mandante", ...) têm um único grupo 0.
+        Os códigos são compactos por domínio (campeonatos, confrontos, jogadores,
+        times), para que as tabelas por grupo tenham o tamanho do domínio e não o do
+        vocabulário; `decodificar_grupo` devolve os valores originais.
+        """
+        if self._chaves_grupos is not None:
+            return self._chaves_grupos
+
+        def onde(condicao, codigos):
+            return np.where(condicao, codigos, NULO).astype(np.int32)
+
+        chaves = {}
+        for col in ('Campeonato', 'Confronto'):
+            if col in self.codigos:
+                chaves[col] = self.codigos[col]
+
+        tip_a, tip_b = self.tip_a, self.tip_b
+        for prefixo, col_a, col_b in (('jogador', 'Jogador A', 'Jogador B'), ('time', 'Time A', 'Time B')):
+            if col_a not in self.codigos or col_b not in self.codigos:
+                continue
+            codigos_a, codigos_b = self.codigos[col_a], self.codigos[col_b]
+            for lado, cond_a, cond_b in (('favor', tip_a, tip_b), ('contra', ~tip_a, ~tip_b)):
+                chaves[f'{prefixo}_{lado}_a'] = onde(cond_a, codigos_a)
+                chaves[f'{prefixo}_{lado}_b'] = onde(cond_b, codigos_b)
+                chaves[f'{prefixo}_{lado}_ambos'] = onde(cond_a & cond_b & (codigos_a == codigos_b), codigos_a)
+
+        if self.tem_times:
+            time_a, time_b = self.codigos['Time A'], self.codigos['Time B']
+            chaves['time_escolhido'] = np.where(tip_a, time_a, onde(tip_b, time_b)).astype(np.int32)
+            chaves['time_adversario'] = np.where(tip_a, time_b, onde(tip_b, time_a)).astype(np.int32)
+
+        # Visões do mesmo domínio compartilham os códigos compactos (somas de lados diferentes se alinham)
+        self._codigos_grupos = {}
+        for dominio in ('Campeonato', 'Confronto', 'jogador', 'time'):
+            nomes = [nome for nome in chaves if nome == dominio or nome.startswith(f'{dominio}_')]
+            if not nomes:
+                continue
+            globais = np.unique(np.concatenate([chaves[nome][chaves[nome] >= 0] for nome in nomes]))
+            for nome in nomes:
+                chave = chaves[nome]
+                chaves[nome] = np.where(chave >= 0, np.searchsorted(globais, chave), NULO).astype(np.int32)
+                self._codigos_grupos[nome] = globais
+
+        for nome, mascara in (("Favorito", self.tip_favorito), ("Azarão", self.tip_azarao),
+                              ("Mandante", tip_a), ("Visitante", tip_b)):
+            chaves[nome] = onde(mascara, 0)
+
+        self._chaves_grupos = chaves
+        return chaves
+
+    def tamanho_grupo(self, nome):
+        """Quantidade de grupos da visão `nome` (tamanho das tabelas por grupo)"""
+        self.chaves_grupos()
+        if nome in self._codigos_grupos:
+            return len(self._codigos_grupos[nome])
+        return int(self._chaves_grupos[nome].max(initial=-1)) + 1
+
+    def decodificar_grupo(self, nome, codigos):
+        """Valores originais dos códigos compactos da visão `nome`"""
+        self.chaves_grupos()
+        return self.decodificar(self._codigos_grupos[nome][np.asarray(codigos, dtype=np.int64)])
+
+    def indice_selecao(self):
+        """Índice Torneio → Campeonato → Tip com entradas e lucro, montado na primeira consulta"""
+        if self._indice_selecao is None:
+            self._indice_selecao = IndiceSelecao(self)
+        return self._indice_selecao
+
+    def codificar(self, valores):
+        """Códigos dos valores informados (AUSENTE para os que não existem)"""
+        return np.array([self._posicoes.get(valor, AUSENTE) for valor in valores], dtype=np.int32)
+
+    def decodificar(self, codigos, vazio=None):
+        """Valores originais dos códigos informados"""
+        codigos = np.asarray(codigos, dtype=np.int64)
+        if not len(self.vocabulario):
+            return np.full(len(codigos), vazio, dtype=object)
+        valores = self.vocabulario[np.where(codigos >= 0, codigos, 0)]
+        return np.where(codigos >= 0, valores, vazio)
+
+    def iguais_a(self, coluna, valor):
+        """Máscara das linhas em que a coluna vale `valor` (nenhuma se a coluna não existir)"""
+        if coluna not in self.codigos:
+            return np.zeros(self.total, dtype=bool)
+        return self.codigos[coluna] == self.codificar([valor])[0]
+
+    def codigos_de(self, coluna, indices):
+        """Códigos de uma coluna restritos às linhas `indices`"""
+        return self.codigos[coluna][indices]
+
+    def mascara(self, indices, config):
+        """Linhas de `indices` que passam por todos os filtros da configuração"""
+        mantidas = np.ones(len(indices), dtype=bool)
+
+        w1 = config.get('w1')
+        w2 = config.get('w2')
+        apostas_a_favor_excl = config.get('apostas_a_favor_excl', [])
+        apostas_contra_excl = config.get('apostas_contra_excl', [])
+        confrontos_excl = config.get('confrontos', [])
+        campeonatos_excl = config.get('campeonatos_excl', [])
+        times_a_favor_excl = config.get('times_a_favor_excl', [])
+        times_contra_excl = config.get('times_contra_excl', [])
+        tipo_apostas_excl = config.get('tipo_apostas_excl', [])
+        tipo_local_excl = config.get('tipo_local_excl', [])
+        diferenca_placar_min = config.get('diferenca_placar_min')
+        diferenca_placar_max = config.get('diferenca_placar_max')
+
+        tip_a = self.tip_a[indices]
+        tip_b = self.tip_b[indices]
+
+        if w1 is not None:
+            mantidas &= self.winrate1[indices] >= w1
+        if w2 is not None:
+            mantidas &= self.winrate2[indices] >= w2
+        if apostas_a_favor_excl:
+            excluidos = self.codificar(apostas_a_favor_excl)
+            mantidas &= ~(tip_a & np.isin(self.codigos_de('Jogador A', indices), excluidos))
+            mantidas &= ~(tip_b & np.isin(self.codigos_de('Jogador B', indices), excluidos))
+        if apostas_contra_excl:
+            excluidos = self.codificar(apostas_contra_excl)
+            mantidas &= ~(~tip_a & np.isin(self.codigos_de('Jogador A', indices), excluidos))
+            mantidas &= ~(~tip_b & np.isin(self.codigos_de('Jogador B', indices), excluidos))
+        if confrontos_excl:
+            mantidas &= ~np.isin(self.codigos_de('Confronto', indices), self.codificar(confrontos_excl))
+        if campeonatos_excl and 'Campeonato' in self.codigos:
+            mantidas &= ~np.isin(self.codigos_de('Campeonato', indices), self.codificar(campeonatos_excl))
+
+        # Filtros de times (se as colunas existirem)
+        if times_a_favor_excl and self.tem_times:
+            excluidos = self.codificar(times_a_favor_excl)
+            mantidas &= ~(tip_a & np.isin(self.codigos_de('Time A', indices), excluidos))
+            mantidas &= ~(tip_b & np.isin(self.codigos_de('Time B', indices), excluidos))
+        if times_contra_excl and self.tem_times:
+            excluidos = self.codificar(times_contra_excl)
+            mantidas &= ~(~tip_a & np.isin(self.codigos_de('Time A', indices), excluidos))
+            mantidas &= ~(~tip_b & np.isin(self.codigos_de('Time B', indices), excluidos))
+
+        # Filtros de tipo de apostas (Favorito/Azarão)
+        if tipo_apostas_excl and self.tem_tipo_aposta:
+            if "Favorito" in tipo_apostas_excl:
+                mantidas &= ~self.tip_favorito[indices]
+            if "Azarão" in tipo_apostas_excl:
+                mantidas &= ~self.tip_azarao[indices]
+
+        # Filtros de tipo local (Mandante/Visitante)
+        if tipo_local_excl:
+            if "Mandante" in tipo_local_excl:
+                mantidas &= ~tip_a
+            if "Visitante" in tipo_local_excl:
+                mantidas &= ~tip_b
+
+        # Filtros de diferença de placar
+        if self.diferenca_placar is not None:
+            if diferenca_placar_min is not None:
+                mantidas &= self.diferenca_placar[indices] >= diferenca_placar_min
+            if diferenca_placar_max is not None:
+                mantidas &= self.diferenca_placar[indices] <= diferenca_placar_max
+
+        return mantidas
+
+    def filtrar(self, indices, config):
+        """Índices que continuam após aplicar a configuração"""
+        return indices[self.mascara(indices, config)]
+
+    def lucro_de(self, indices):
+        """Lucro total das linhas `indices`, somado na ordem das linhas"""
+        return self.lucro_exato[indices].sum()
+
+    def linhas(self, indices):
+        """Linhas `indices` da planilha, com o índice nas posições originais"""
+        return self.df.iloc[indices]
+
+    def compartilhar(self):
+        """Preparar o dataset para várias sessões ao mesmo tempo.
+
+        Monta já as estruturas calculadas sob demanda (assim nenhuma sessão as
+        monta em paralelo com outra) e marca todos os arrays como somente leitura.
+        """
+        self.chaves_grupos()
+        self.indice_selecao()
+        for array in _arrays(vars(self)):
+            array.flags.writeable = False
+        return self
+
+    def memoria(self):
+        """Bytes aproximados ocupados: DataFrame (com os textos) e arrays derivados"""
+        total = int(self.df.memory_usage(index=True, deep=True).sum())
+        return total + sum(array.nbytes for array in _arrays(vars(self)))
+
+
+def _arrays(valores):
+    """Arrays numpy entre os valores, inclusive dentro de dicionários"""
+    for valor in valores.values():
+        if isinstance(valor, np.ndarray):
+            yield valor
+        elif isinstance(valor, dict):
+            yield from _arrays(valor)
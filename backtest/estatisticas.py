@@ -0,0 +1,237 @@
+"""Somas de lucro e contagens por grupo usadas para pontuar os candidatos.
+
+`EstatisticasGrupos` monta as tabelas de todas as visões uma única vez, em
+unidades inteiras de lucro (centavos, por exemplo), e a cada etapa aceita só
+subtrai a contribuição das linhas removidas. Quando o lucro não tem uma
+representação decimal exata, `GruposDiretos` recalcula as tabelas a partir
+das linhas atuais a cada etapa.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+EPS = np.finfo(float).eps
+
+# Colunas numéricas com candidatos de limiar
+COLUNAS_LIMIAR = ('winrate1', 'winrate2', 'diferenca_placar')
+
+MAX_CASAS_DECIMAIS = 6
+
+
+def somas_limiar(valores, lucro, maior_igual=True):
+    """Lucro e entradas mantidos para cada limiar único de uma coluna numérica
+
+    Com `maior_igual` mantém as linhas com valor >= limiar, senão valor <= limiar.
+    Valores nulos nunca são mantidos, como nas comparações do pandas.
+    """
+    valores = np.asarray(valores, dtype=float)
+    validos = ~np.isnan(valores)
+    valores = valores[validos]
+    ordem = np.argsort(valores, kind="stable")
+    valores = valores[ordem]
+    acumulado = np.concatenate(([0.0], np.cumsum(lucro[validos][ordem], dtype=float)))
+    unicos = np.unique(valores)
+
+    if maior_igual:
+        inicio = np.searchsorted(valores, unicos, side="left")
+        lucros, entradas = acumulado[-1] - acumulado[inicio], len(valores) - inicio
+    else:
+        fim = np.searchsorted(valores, unicos, side="right")
+        lucros, entradas = acumulado[fim], fim
+
+    return dict(zip(unicos, zip(lucros, entradas)))
+
+
+def somas_grade(valores_a, valores_b, lucro):
+    """Lucro e entradas mantidos para cada par de limiares (>=) de duas colunas numéricas
+
+    Retorna (limiares_a, limiares_b, lucros, entradas), com as tabelas indexadas
+    por [i, j]: a posição 0 de cada eixo é "sem limiar" (todas as linhas, inclusive
+    as nulas) e a posição k >= 1 mantém as linhas com valor >= k-ésimo limiar.
+    Somas acumuladas a partir do fim nos dois eixos, em O(Ua·Ub).
+    """
+    limiares, posicoes = [], []
+    for valores in (valores_a, valores_b):
+        valores = np.asarray(valores, dtype=float)
+        nulos = np.isnan(valores)
+        unicos = np.unique(valores[~nulos])
+        limiares.append(unicos)
+        posicoes.append(np.where(nulos, 0, np.searchsorted(unicos, valores, side="right")))
+
+    forma = (len(limiares[0]) + 1, len(limiares[1]) + 1)
+    chave = posicoes[0] * forma[1] + posicoes[1]
+    tamanho = forma[0] * forma[1]
+    entradas = np.bincount(chave, minlength=tamanho).reshape(forma)
+    lucros = np.bincount(chave, weights=lucro, minlength=tamanho).reshape(forma)
+
+    def acumular(tabela):
+        return tabela[::-1, ::-1].cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]
+
+    return limiares[0], limiares[1], acumular(lucros), acumular(entradas)
+
+
+def somar_grupos(lucro, chave, tamanho):
+    """Soma e contagem do lucro por código de `chave` (sem nulos), em arrays densos de `tamanho`"""
+    presentes = chave >= 0
+    return (np.bincount(chave[presentes], weights=lucro[presentes], minlength=tamanho),
+            np.bincount(chave[presentes], minlength=tamanho))
+
+
+def escala_exata(lucro):
+    """Menor potência de 10 que torna todo lucro um inteiro exato, ou None"""
+    for casas in range(MAX_CASAS_DECIMAIS + 1):
+        escala = 10 ** casas
+        unidades = np.rint(lucro * escala)
+        # As somas precisam continuar inteiras exatas em float64
+        if not np.abs(unidades).sum() < 2 ** 53:
+            return None
+        if np.array_equal(unidades / escala, lucro):
+            return escala
+    return None
+
+
+def criar_estatisticas(dataset, indices):
+    """Estatísticas incrementais quando o lucro permite, senão recalculadas por etapa"""
+    escala = escala_exata(dataset.lucro_exato)
+    if escala is None:
+        return GruposDiretos(dataset, indices)
+    return EstatisticasGrupos(dataset, indices, escala)
+
+
+class GruposDiretos:
+    """Tabelas por grupo calculadas a partir das linhas atuais com o groupby do pandas"""
+
+    def __init__(self, dataset, indices):
+        self.dataset = dataset
+        self.atualizar(indices)
+
+    def atualizar(self, indices):
+        """Passar a refletir as linhas `indices`"""
+        self.indices = indices
+        self.lucro = pd.Series(self.dataset.lucro_exato[indices])
+        self.lucro32 = self.dataset.lucro[indices]
+        self.total = len(indices)
+        self.lucro_total = self.lucro.sum()
+
+        # Limite do erro entre as somas por delta e a soma direta das linhas
+        erro_float32 = float(np.abs(self.lucro32 - self.lucro.to_numpy()).sum())
+        self.margem = erro_float32 + 4 * self.total * EPS * float(self.lucro.abs().sum())
+
+    def copiar(self):
+        """Cópia independente, para seguir outro caminho da busca a partir deste estado"""
+        return copy.copy(self)
+
+    def somas_grupos(self, nome):
+        """Lucro e contagem por código da visão `nome` (zero nos grupos ausentes)"""
+        chave = self.dataset.chaves_grupos()[nome]
+        return somar_grupos(self.lucro.to_numpy(), chave[self.indices], self.dataset.tamanho_grupo(nome))
+
+    def valores(self, coluna):
+        """Valores únicos e não nulos da coluna nas linhas atuais"""
+        valores = getattr(self.dataset, coluna)[self.indices]
+        return np.unique(valores[~np.isnan(valores)])
+
+    def limiar(self, coluna, maior_igual=True):
+        return somas_limiar(getattr(self.dataset, coluna)[self.indices], self.lucro32, maior_igual)
+
+    def grade(self, coluna_a, coluna_b):
+        """Tabela 2-D de lucro e entradas por par de limiares (ver somas_grade)"""
+        return somas_grade(getattr(self.dataset, coluna_a)[self.indices],
+                           getattr(self.dataset, coluna_b)[self.indices], self.lucro.to_numpy())
+
+
+class EstatisticasGrupos:
+    """Tabelas por grupo em unidades inteiras de lucro, atualizadas pelas linhas removidas"""
+
+    def __init__(self, dataset, indices, escala):
+        self.dataset = dataset
+        self.escala = escala
+        # Inteiros exatos guardados em float64 (np.bincount soma pesos em float64)
+        self.unidades = np.rint(dataset.lucro_exato * escala)
+        self.chaves = dict(dataset.chaves_grupos())
+        tamanhos = {nome: dataset.tamanho_grupo(nome) for nome in self.chaves}
+
+        # Colunas de limiar viram grupos pelo posto do valor entre os únicos do dataset
+        self.unicos = {}
+        for coluna in COLUNAS_LIMIAR:
+            valores = getattr(dataset, coluna)
+            if valores is None:
+                continue
+            validos = ~np.isnan(valores)
+            unicos, postos = np.unique(valores[validos], return_inverse=True)
+            chave = np.full(len(valores), -1, dtype=np.int32)
+            chave[validos] = postos
+            self.chaves[coluna] = chave
+            self.unicos[coluna] = unicos
+            tamanhos[coluna] = len(unicos)
+
+        self.indices = indices
+        self.somas = {}
+        self.contagens = {}
+        for nome, chave in self.chaves.items():
+            self.somas[nome], self.contagens[nome] = somar_grupos(self.unidades[indices], chave[indices],
+                                                                  tamanhos[nome])
+
+        self.total = len(indices)
+        self.unidades_total = self.unidades[indices].sum()
+        self.unidades_abs = np.abs(self.unidades[indices]).sum()
+
+    @property
+    def lucro_total(self):
+        return self.unidades_total / self.escala
+
+    @property
+    def margem(self):
+        # As somas são exatas; resta o erro da soma em float das linhas materializadas
+        return 4 * (self.total + 1) * EPS * self.unidades_abs / self.escala
+
+    def atualizar(self, indices):
+        """Subtrair as linhas que saíram de `self.indices` para `indices`"""
+        removidas = self.indices[~np.isin(self.indices, indices, assume_unique=True)]
+        unidades = self.unidades[removidas]
+        for nome, chave in self.chaves.items():
+            chave_linhas = chave[removidas]
+            presentes = chave_linhas >= 0
+            np.subtract.at(self.somas[nome], chave_linhas[presentes], unidades[presentes])
+            np.subtract.at(self.contagens[nome], chave_linhas[presentes], 1)
+
+        self.indices = indices
+        self.total = len(indices)
+        self.unidades_total -= unidades.sum()
+        self.unidades_abs -= np.abs(unidades).sum()
+
+    def copiar(self):
+        """Cópia independente, para seguir outro caminho da busca a partir deste estado"""
+        copia = copy.copy(self)
+        copia.somas = {nome: somas.copy() for nome, somas in self.somas.items()}
+        copia.contagens = {nome: contagens.copy() for nome, contagens in self.contagens.items()}
+        return copia
+
+    def somas_grupos(self, nome):
+        """Lucro e contagem por código da visão `nome` (zero nos grupos ausentes)"""
+        return self.somas[nome] / self.escala, self.contagens[nome]
+
+    def valores(self, coluna):
+        """Valores únicos e não nulos da coluna nas linhas atuais"""
+        return self.unicos[coluna][self.contagens[coluna] > 0]
+
+    def limiar(self, coluna, maior_igual=True):
+        """Lucro e entradas mantidos para cada limiar presente, pelas somas acumuladas dos postos"""
+        contagem = self.contagens[coluna]
+        presentes = contagem > 0
+        somas = self.somas[coluna][presentes]
+        contagem = contagem[presentes]
+        if maior_igual:
+            lucros, entradas = np.cumsum(somas[::-1])[::-1], np.cumsum(contagem[::-1])[::-1]
+        else:
+            lucros, entradas = np.cumsum(somas), np.cumsum(contagem)
+        return dict(zip(self.unicos[coluna][presentes], zip(lucros / self.escala, entradas)))
+
+    def grade(self, coluna_a, coluna_b):
+        """Tabela 2-D de lucro e entradas por par de limiares, somada em unidades exatas"""
+        limiares_a, limiares_b, unidades, entradas = somas_grade(
+            getattr(self.dataset, coluna_a)[self.indices], getattr(self.dataset, coluna_b)[self.indices],
+            self.unidades[self.indices])
+        return limiares_a, limiares_b, unidades / self.escala, entradas
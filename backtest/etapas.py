@@ -0,0 +1,43 @@
+"""Histórico compacto das etapas da busca gulosa"""
+
+import numpy as np
+
+_NUNCA_REMOVIDA = np.iinfo(np.int32).max
+
+
+class HistoricoEtapas:
+    """Linhas de cada etapa, guardadas como a etapa em que cada linha foi removida.
+
+    Como cada etapa filtra as linhas da anterior, um único vetor int32 do tamanho
+    do estado inicial descreve todas elas, qualquer que seja o número de etapas.
+    """
+
+    def __init__(self, indices_iniciais):
+        self.indices_iniciais = np.asarray(indices_iniciais)
+        self.remocao = np.full(len(self.indices_iniciais), _NUNCA_REMOVIDA, dtype=np.int32)
+        self._posicoes_atuais = np.arange(len(self.indices_iniciais))
+        self.total = 1
+
+    def registrar(self, indices):
+        """Registrar a próxima etapa a partir dos índices que continuam nela"""
+        mantidas = np.isin(self.indices_iniciais[self._posicoes_atuais], indices)
+        self.remocao[self._posicoes_atuais[~mantidas]] = self.total
+        self._posicoes_atuais = self._posicoes_atuais[mantidas]
+        self.total += 1
+
+    def indices(self, posicao):
+        """Índices das linhas da etapa na posição informada"""
+        return self.indices_iniciais[self.remocao > posicao]
+
+    def exportar(self):
+        """Arrays que descrevem o histórico, para gravar em disco (`total` fica de fora)"""
+        return {'indices_iniciais': self.indices_iniciais, 'remocao': self.remocao}
+
+    @classmethod
+    def restaurar(cls, linhas, total):
+        """Histórico a partir de `exportar()` e do número de etapas registradas"""
+        historico = cls(linhas['indices_iniciais'])
+        historico.remocao = np.asarray(linhas['remocao'], dtype=np.int32).copy()
+        historico._posicoes_atuais = np.flatnonzero(historico.remocao == _NUNCA_REMOVIDA)
+        historico.total = int(total)
+        return historico
@@ -0,0 +1,283 @@
+"""Busca em feixe sobre os mesmos candidatos da busca gulosa.
+
+Em vez de seguir só o melhor ajuste, cada profundidade mantém os `largura`
+melhores estados. Todos os estados do feixe geram candidatos pelo
+`MotorPontuacao`, e só os filhos que podem ficar entre os melhores são
+materializados e comparados pelo ROI exato. Configurações iguais alcançadas
+em ordens diferentes contam como um único estado.
+
+O primeiro estado do feixe segue sempre o caminho da busca gulosa (o melhor
+filho do estado anterior): com largura 1 a busca é a gulosa, e com largura
+maior o melhor estado encontrado nunca é pior que o dela.
+
+A busca para quando o `ControleBusca` pede (tempo, avaliações ou pausa) e pode
+continuar depois a partir de `exportar()`.
+"""
+
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from .controle import TEMPO, ControleBusca
+from .estatisticas import EPS, criar_estatisticas
+from .pontuacao import Candidato, MotorPontuacao
+
+
+class EstadoFeixe(NamedTuple):
+    """Estado alcançado pela busca, com os passos (candidatos) desde o estado inicial"""
+    config: dict
+    entradas: int
+    lucro: float
+    roi: float
+    passos: tuple
+
+
+def chave_estado(config):
+    """Identificação da configuração, independente da ordem em que as exclusões entraram"""
+    return frozenset((nome, item) for nome, valor in config.items()
+                     for item in (valor if isinstance(valor, list) else (valor,)))
+
+
+def chave_filho(chave_pai, candidato):
+    """`chave_estado` da configuração do candidato, a partir da chave do pai (sem montar a configuração)"""
+    substituidos = [(nome, candidato.base[nome]) for nome, _ in candidato.mudancas
+                    if not isinstance(candidato.base[nome], list)]
+    return chave_pai.difference(substituidos).union(candidato.mudancas)
+
+
+def fronteira_pareto(estados):
+    """Estados não dominados em ROI e entradas, do maior para o menor número de entradas"""
+    fronteira = []
+    melhor_roi = -float('inf')
+    for estado in sorted(estados, key=lambda e: (-e.entradas, -e.roi)):
+        if estado.roi > melhor_roi:
+            fronteira.append(estado)
+            melhor_roi = estado.roi
+    return fronteira
+
+
+class BuscaFeixe:
+    """Busca em feixe de largura fixa, com limite de profundidade e orçamento do `controle`
+
+    `ao_avancar(busca)`, se informado, é chamado ao fim de cada profundidade
+    (por exemplo, para gravar um checkpoint).
+    """
+
+    def __init__(self, dataset, busca_config, min_entradas_config, limite_minimo, largura,
+                 controle=None, max_profundidade=100, max_candidatos=0, executor=None, reporter=None,
+                 ao_avancar=None):
+        self.dataset = dataset
+        self.busca_config = busca_config
+        self.min_entradas_config = min_entradas_config
+        self.limite_minimo = limite_minimo
+        self.largura = max(1, int(largura))
+        self.controle = controle or ControleBusca()
+        self.max_profundidade = max_profundidade
+        self.max_candidatos = max_candidatos
+        self.executor = executor
+        self.reporter = reporter
+        self.ao_avancar = ao_avancar
+        self.interrupcao = None
+        self.melhor = None
+
+    def executar(self, config, indices, estatisticas):
+        """Buscar a partir de `config`/`indices`; preenche `melhor`, `explorados` e `perfil`"""
+        lucro = self.dataset.lucro_de(indices)
+        raiz = EstadoFeixe(config, len(indices), lucro, lucro / len(indices), ())
+        self._feixe = [(raiz, indices, estatisticas, chave_estado(config))]
+        self._visitados = {self._feixe[0][3]}
+        self.melhor = raiz
+        self.explorados = [raiz]
+        self.perfil = []
+        self.profundidade = 1
+        return self._continuar()
+
+    def exportar(self):
+        """Estado da busca para `retomar`: dados serializáveis em JSON e as linhas de cada estado do feixe.
+
+        Os passos compartilhados entre estados são gravados uma vez, com a
+        configuração resultante; as somas por grupo são remontadas das linhas.
+        """
+        posicoes = {}
+        passos = []
+
+        def codificar(estado):
+            for passo in estado.passos:
+                if id(passo) not in posicoes:
+                    posicoes[id(passo)] = len(passos)
+                    passos.append([passo.tipo, passo.valor, passo.lucro, passo.entradas, passo.config])
+            return [estado.config, estado.entradas, estado.lucro, estado.roi,
+                    [posicoes[id(passo)] for passo in estado.passos]]
+
+        dados = {
+            'feixe': [codificar(estado) for estado, *_ in self._feixe],
+            'visitados': [[list(item) for item in chave] for chave in self._visitados],
+            'explorados': [codificar(estado) for estado in self.explorados],
+            'melhor': codificar(self.melhor),
+            'passos': passos,
+            'perfil': self.perfil,
+            'profundidade': self.profundidade,
+        }
+        linhas = {f'feixe_{posicao}': indices for posicao, (_, indices, _, _) in enumerate(self._feixe)}
+        return dados, linhas
+
+    def retomar(self, dados, linhas):
+        """Continuar uma busca interrompida a partir de `exportar()`"""
+        # Sem `mudancas`, a configuração do passo é a própria base
+        passos = [Candidato(tipo, tuple(valor) if isinstance(valor, list) else valor, lucro, entradas, config, ())
+                  for tipo, valor, lucro, entradas, config in dados['passos']]
+
+        def decodificar(salvo):
+            config, entradas, lucro, roi, posicoes = salvo
+            return EstadoFeixe(config, entradas, lucro, roi, tuple(passos[posicao] for posicao in posicoes))
+
+        self._feixe = []
+        for posicao, salvo in enumerate(dados['feixe']):
+            estado = decodificar(salvo)
+            indices = linhas[f'feixe_{posicao}']
+            self._feixe.append((estado, indices, criar_estatisticas(self.dataset, indices), chave_estado(estado.config)))
+        self._visitados = {frozenset(tuple(item) for item in chave) for chave in dados['visitados']}
+        self.melhor = decodificar(dados['melhor'])
+        self.explorados = [decodificar(salvo) for salvo in dados['explorados']]
+        self.perfil = list(dados['perfil'])
+        self.profundidade = dados['profundidade']
+        return self._continuar()
+
+    def _continuar(self):
+        self.interrupcao = None
+        # Cada passo melhora o ROI do pai, então a busca termina quando nenhum estado tem filhos
+        while self._feixe and self.profundidade < self.max_profundidade:
+            self.interrupcao = self.controle.motivo_parada()
+            if self.interrupcao is not None:
+                break
+            if self.reporter is not None:
+                self.reporter.atualizar(min(self.profundidade / self.max_profundidade, 0.95),
+                                        f"🔄 Processando profundidade {self.profundidade} ({len(self._feixe)} estados)...")
+
+            inicio = time.perf_counter()
+            filhos, tempos, cortada = self._candidatos(self._feixe, self._visitados)
+            fim_pontuacao = time.perf_counter()
+            feixe = self._selecionar(self._feixe, filhos)
+            self.perfil.append({
+                'iteracao': self.profundidade,
+                'candidatos': len(filhos),
+                'estados': len(feixe),
+                'entradas': sum(estado.entradas for estado, *_ in self._feixe),
+                'pontuacao': fim_pontuacao - inicio,
+                'escolha': time.perf_counter() - fim_pontuacao,
+                'familias': tempos,
+            })
+            if not feixe:
+                # Profundidade cortada pelo tempo: o feixe atual fica para ser retomado
+                if cortada:
+                    self.interrupcao = TEMPO
+                else:
+                    self._feixe = []
+                break
+
+            for estado, _, _, chave in feixe:
+                self._visitados.add(chave)
+                self.explorados.append(estado)
+                if estado.roi > self.melhor.roi:
+                    self.melhor = estado
+            self._feixe = feixe
+            self.profundidade += 1
+            if self.ao_avancar is not None:
+                self.ao_avancar(self)
+        return self.melhor
+
+    def fronteira(self):
+        return fronteira_pareto(self.explorados)
+
+    def _esgotado(self):
+        # Pausa e limite de avaliações esperam o fim da profundidade, para que a busca retomada
+        # siga exatamente o caminho da busca sem interrupção; só o tempo corta a profundidade
+        return self.controle.motivo_parada() == TEMPO
+
+    def _candidatos(self, feixe, visitados):
+        """Candidatos viáveis de todos os estados do feixe, sem estados repetidos.
+
+        Os filhos do primeiro estado não são comparados com os já visitados: o
+        caminho guloso segue mesmo que chegue a um estado alcançado antes por
+        outro caminho do feixe.
+
+        Retorna [(posição do pai, candidato, margem, chave)], os tempos somados por família
+        e se a profundidade foi cortada pelo tempo antes de expandir todos os estados.
+        """
+        filhos = []
+        vistos = set()
+        tempos = {}
+        for posicao, (estado, _, estatisticas, chave_pai) in enumerate(feixe):
+            # Com o tempo esgotado, seguem só os filhos dos estados já expandidos
+            if filhos and self._esgotado():
+                return filhos, tempos, True
+            motor = MotorPontuacao(estatisticas, estado.config, self.busca_config, self.min_entradas_config,
+                                   self.limite_minimo, self.max_candidatos)
+            candidatos = motor.gerar_candidatos(self.executor)
+            self.controle.contar(len(candidatos))
+            for candidato in candidatos:
+                if candidato.entradas < self.limite_minimo:
+                    continue
+                chave = chave_filho(chave_pai, candidato)
+                if chave in vistos or (posicao > 0 and chave in visitados):
+                    continue
+                vistos.add(chave)
+                filhos.append((posicao, candidato, motor.margem, chave))
+            for familia, tempo in motor.tempos.items():
+                tempos[familia] = tempos.get(familia, 0.0) + tempo
+        return filhos, tempos, False
+
+    def _selecionar(self, feixe, filhos):
+        """Próximo feixe: os `largura` filhos de maior ROI exato que melhoram o ROI do pai.
+
+        O melhor filho do primeiro estado (caminho guloso) entra sempre, em primeiro.
+        Como em `escolher_ajuste`, só os filhos que podem ficar entre os melhores
+        dentro da margem de arredondamento são materializados.
+        """
+        if not filhos:
+            return []
+        entradas = np.array([c.entradas for _, c, _, _ in filhos], dtype=float)
+        roi = np.array([c.lucro for _, c, _, _ in filhos], dtype=float) / entradas
+        erro = np.array([margem for _, _, margem, _ in filhos]) / entradas + 4 * EPS * np.abs(roi)
+        posicoes = np.array([posicao for posicao, _, _, _ in filhos])
+        roi_pai = np.array([estado.roi for estado, _, _, _ in feixe])[posicoes]
+
+        possiveis = roi + erro > roi_pai
+        if not possiveis.any():
+            return []
+        minimos = (roi - erro)[possiveis]
+        piso = np.sort(minimos)[-self.largura] if len(minimos) > self.largura else -np.inf
+        disputa = possiveis & (roi + erro >= piso)
+        guia = possiveis & (posicoes == 0)
+        if guia.any():
+            disputa |= guia & (roi + erro >= (roi - erro)[guia].max())
+
+        avaliados = []
+        for (posicao, candidato, _, chave), em_disputa in zip(filhos, disputa):
+            if not em_disputa:
+                continue
+            pai, indices_pai, _, _ = feixe[posicao]
+            config = candidato.config
+            indices = self.dataset.filtrar(indices_pai, config)
+            if len(indices) < self.limite_minimo or len(indices) == 0:
+                continue
+            lucro = self.dataset.lucro_de(indices)
+            roi_filho = lucro / len(indices)
+            if roi_filho > pai.roi:
+                avaliados.append((EstadoFeixe(config, len(indices), lucro, roi_filho, pai.passos + (candidato,)),
+                                  posicao, indices, chave))
+
+        # Melhor filho do caminho guloso, com desempate pela ordem dos candidatos
+        do_guia = [item for item in avaliados if item[1] == 0]
+        escolhidos = [max(do_guia, key=lambda item: item[0].roi)] if do_guia else []
+
+        # Ordenação estável: empates ficam na ordem dos pais e dos candidatos
+        avaliados.sort(key=lambda item: -item[0].roi)
+        escolhidos += [item for item in avaliados if not escolhidos or item is not escolhidos[0]]
+        proximo = []
+        for estado, posicao, indices, chave in escolhidos[:self.largura]:
+            estatisticas = feixe[posicao][2].copiar()
+            estatisticas.atualizar(indices)
+            proximo.append((estado, indices, estatisticas, chave))
+        return proximo
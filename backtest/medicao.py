@@ -0,0 +1,81 @@
+"""Medição opcional dos trechos quentes da análise.
+
+Com a medição ligada, cada seção (busca, etapa, família de candidatos, filtros,
+ROI e partes do relatório) acumula chamadas, tempo e linhas processadas.
+Desligada, as seções não registram nada. O perfil completo de uma análise
+(cProfile) é guardado no formato do `pstats.Stats.dump_stats`, para abrir fora
+da aplicação com `pstats` ou snakeviz; ele cobre só a thread da busca, não as
+famílias pontuadas em paralelo.
+"""
+
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Medidor:
+    """Chamadas, segundos e linhas processadas por seção, seguro para várias threads"""
+
+    def __init__(self, ativo=True):
+        self.ativo = ativo
+        self.secoes = {}
+        self._trava = threading.Lock()
+
+    def registrar(self, secao, segundos, linhas=0):
+        if not self.ativo:
+            return
+        with self._trava:
+            item = self.secoes.setdefault(secao, {'chamadas': 0, 'segundos': 0.0, 'linhas': 0})
+            item['chamadas'] += 1
+            item['segundos'] += segundos
+            item['linhas'] += int(linhas)
+
+    @contextmanager
+    def medir(self, secao, linhas=0):
+        """Cronometrar o bloco como uma chamada de `secao` sobre `linhas` linhas"""
+        if not self.ativo:
+            yield
+            return
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(secao, time.perf_counter() - inicio, linhas)
+
+    def resumo(self):
+        """Seções da mais demorada para a mais rápida, com linhas por segundo"""
+        with self._trava:
+            itens = [{'secao': secao, **item} for secao, item in self.secoes.items()]
+        for item in itens:
+            item['linhas_por_s'] = item['linhas'] / item['segundos'] if item['segundos'] > 0 else 0.0
+        return sorted(itens, key=lambda item: -item['segundos'])
+
+
+def iniciar_perfil():
+    """Ligar o cProfile na thread atual (None se outro perfilador já estiver ativo)"""
+    perfilador = cProfile.Profile()
+    try:
+        perfilador.enable()
+    except ValueError:
+        return None
+    return perfilador
+
+
+def encerrar_perfil(perfilador):
+    """Desligar o perfilador e devolver o dump do pstats (bytes, como um arquivo .pstats)"""
+    perfilador.disable()
+    return marshal.dumps(pstats.Stats(perfilador).stats)
+
+
+def resumo_perfil(dump, ordem="cumulative", limite=25):
+    """Texto das `limite` funções mais caras do dump, na ordem pedida"""
+    saida = io.StringIO()
+    estatisticas = pstats.Stats(stream=saida)
+    estatisticas.stats = marshal.loads(dump)
+    estatisticas.get_top_level_stats()
+    estatisticas.strip_dirs().sort_stats(ordem).print_stats(limite)
+    return saida.getvalue()
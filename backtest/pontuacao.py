@@ -0,0 +1,326 @@
+"""Motor de pontuação vetorizado para a busca gulosa.
+
+Cada ajuste candidato é avaliado pelo delta de (lucro, entradas) que ele remove
+do conjunto atual, lido das tabelas por grupo e somas acumuladas mantidas em
+`backtest.estatisticas`, sem copiar o DataFrame. Apenas o ajuste escolhido é
+materializado.
+"""
+
+import time
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from .estatisticas import EPS
+
+class Candidato(NamedTuple):
+    """Ajuste candidato com o lucro e as entradas resultantes
+
+    A configuração resultante só é montada quando pedida (`config`): `mudancas`
+    guarda os pares (chave, valor) aplicados sobre `base`, acrescentando o valor
+    às chaves de lista (exclusões) e substituindo as demais (limiares).
+    """
+    tipo: str
+    valor: Any
+    lucro: float
+    entradas: int
+    base: dict
+    mudancas: tuple
+
+    @property
+    def config(self):
+        config = self.base.copy()
+        for chave, valor in self.mudancas:
+            atual = config[chave]
+            config[chave] = atual + [valor] if isinstance(atual, list) else valor
+        return config
+
+
+class MotorPontuacao:
+    """Avalia em lote os ajustes candidatos de uma iteração da busca gulosa
+
+    Todo candidato elegível de cada família é pontuado; `max_candidatos` (0 = sem
+    limite) restringe as famílias de exclusão e de placar aos mais promissores.
+    """
+
+    def __init__(self, estatisticas, config, busca_config, min_entradas_config, limite_minimo=0,
+                 max_candidatos=0):
+        self.estatisticas = estatisticas
+        self.dataset = estatisticas.dataset
+        self.config = config
+        self.busca_config = busca_config
+        self.min_entradas_config = min_entradas_config
+        self.limite_minimo = limite_minimo
+        self.max_candidatos = int(max_candidatos or 0)
+
+        self.lucro_total = estatisticas.lucro_total
+        self.total = estatisticas.total
+        self.margem = estatisticas.margem
+
+    def gerar_candidatos(self, executor=None):
+        """Listar todos os candidatos na mesma ordem da busca original.
+
+        Com um `executor`, as famílias são pontuadas em paralelo; os resultados
+        são juntados na ordem fixa das famílias, preservando o desempate.
+        """
+        familias = (self._winrate1, self._winrate2, self._winrates_grade, self._campeonatos,
+                    self._apostas_a_favor, self._apostas_contra, self._confrontos,
+                    self._tipo_apostas, self._tipo_local, self._times_a_favor,
+                    self._times_contra, self._diferenca_placar_min,
+                    self._diferenca_placar_max)
+        self.tempos = {}
+        if executor is None:
+            resultados = [self._cronometrar(familia) for familia in familias]
+        else:
+            resultados = [futuro.result() for futuro in [executor.submit(self._cronometrar, familia)
+                                                         for familia in familias]]
+
+        candidatos = []
+        for resultado in resultados:
+            candidatos.extend(resultado)
+        return candidatos
+
+    def _cronometrar(self, familia):
+        """Executar uma família guardando seu tempo em `self.tempos`"""
+        inicio = time.perf_counter()
+        resultado = familia()
+        self.tempos[familia.__name__.lstrip('_')] = time.perf_counter() - inicio
+        return resultado
+
+    def _limitar(self, itens):
+        """Primeiros `max_candidatos` itens (todos quando não há limite)"""
+        return itens[:self.max_candidatos] if self.max_candidatos else itens
+
+    def _limiar(self, tipo, coluna, chave_config, valores, maior_igual=True, limitar=False):
+        """Candidatos de limiar (>= ou <=) a partir das somas acumuladas"""
+        atual = self.config[chave_config]
+        valores = [valor for valor in valores if atual is None or (valor > atual if maior_igual else valor < atual)]
+        if limitar:
+            valores = self._limitar(valores)
+        if not valores:
+            return []
+
+        mantidos = self.estatisticas.limiar(coluna, maior_igual)
+        candidatos = []
+        for valor in valores:
+            lucro, entradas = mantidos[valor]
+            candidatos.append(Candidato(tipo, valor, lucro, int(entradas), self.config, ((chave_config, valor),)))
+        return candidatos
+
+    def _exclusao(self, tipo, chave_config, nome, codigos, lucros_removidos, entradas_removidas):
+        """Candidatos de exclusão dos `codigos` da visão `nome`, pelo lucro e entradas que cada um remove"""
+        excluidos = set(self.config[chave_config])
+        candidatos = []
+        valores = self.dataset.decodificar_grupo(nome, codigos)
+        for valor, lucro, entradas in zip(valores, lucros_removidos[codigos].tolist(),
+                                          entradas_removidas[codigos].tolist()):
+            if valor not in excluidos:
+                candidatos.append(Candidato(tipo, valor, self.lucro_total - lucro, self.total - int(entradas),
+                                            self.config, ((chave_config, valor),)))
+        return candidatos
+
+    def _removidos(self, prefixo, lado):
+        """Lucro e entradas removidos ao excluir cada código pelos dois lados (linhas em ambos contam uma vez)"""
+        lucro_a, contagem_a = self.estatisticas.somas_grupos(f'{prefixo}_{lado}_a')
+        lucro_b, contagem_b = self.estatisticas.somas_grupos(f'{prefixo}_{lado}_b')
+        lucro_ambos, contagem_ambos = self.estatisticas.somas_grupos(f'{prefixo}_{lado}_ambos')
+        return lucro_a + lucro_b - lucro_ambos, contagem_a + contagem_b - contagem_ambos
+
+    def _prejudiciais(self, lucro, contagem, min_quantidade):
+        """Códigos com lucro negativo e quantidade mínima, do pior para o melhor"""
+        codigos = np.flatnonzero((lucro < 0) & (contagem >= min_quantidade))
+        return self._limitar(codigos[np.argsort(lucro[codigos], kind='stable')])
+
+    def _winrate1(self):
+        if not self.busca_config.get('usar_winrate1', True) or self.busca_config.get('usar_grade_winrates', False):
+            return []
+        return self._limiar('w1', 'winrate1', 'w1', list(self.estatisticas.valores('winrate1')))
+
+    def _winrate2(self):
+        if not self.busca_config.get('usar_winrate2', True) or self.busca_config.get('usar_grade_winrates', False):
+            return []
+        return self._limiar('w2', 'winrate2', 'w2', list(self.estatisticas.valores('winrate2')))
+
+    def _winrates_grade(self):
+        """Pares (w1, w2) da grade 2-D de limiares que podem ser o melhor par
+
+        Substitui as famílias de Winrate 1 e 2: a grade contém os limiares isolados
+        (linha e coluna "sem limiar") e todas as combinações, avaliadas de uma vez.
+        """
+        usar_w1 = self.busca_config.get('usar_winrate1', True)
+        usar_w2 = self.busca_config.get('usar_winrate2', True)
+        if not self.busca_config.get('usar_grade_winrates', False) or not (usar_w1 or usar_w2):
+            return []
+
+        limiares1, limiares2, lucros, entradas = self.estatisticas.grade('winrate1', 'winrate2')
+
+        # Como nas famílias 1-D, só limiares acima dos atuais; eixo desligado fica sem limiar
+        eixos = []
+        for limiares, usar, chave_config in ((limiares1, usar_w1, 'w1'), (limiares2, usar_w2, 'w2')):
+            atual = self.config[chave_config]
+            acima = limiares > atual if atual is not None else np.ones(len(limiares), dtype=bool)
+            eixos.append(np.concatenate(([True], acima & usar)))
+        validos = eixos[0][:, None] & eixos[1][None, :] & (entradas >= max(self.limite_minimo, 1))
+        validos[0, 0] = False
+        linhas, colunas = np.nonzero(validos)
+        if not len(linhas):
+            return []
+
+        # Só os pares que podem disputar o primeiro lugar dentro da margem viram candidatos
+        roi = lucros[linhas, colunas] / entradas[linhas, colunas]
+        erro = self.margem / entradas[linhas, colunas] + 4 * EPS * np.abs(roi)
+        disputa = roi + erro >= (roi - erro).max()
+
+        candidatos = []
+        for i, j in zip(linhas[disputa], colunas[disputa]):
+            mudancas = ((('w1', limiares1[i - 1]),) if i else ()) + ((('w2', limiares2[j - 1]),) if j else ())
+            if not j:
+                tipo, valor = 'w1', limiares1[i - 1]
+            elif not i:
+                tipo, valor = 'w2', limiares2[j - 1]
+            else:
+                tipo, valor = 'w1_w2', (limiares1[i - 1], limiares2[j - 1])
+            candidatos.append(Candidato(tipo, valor, float(lucros[i, j]), int(entradas[i, j]), self.config, mudancas))
+        return candidatos
+
+    def _campeonatos(self):
+        if not self.busca_config.get('usar_excl_campeonatos', True) or 'Campeonato' not in self.dataset.codigos:
+            return []
+        lucro, contagem = self.estatisticas.somas_grupos('Campeonato')
+        codigos = self._prejudiciais(lucro, contagem, self.min_entradas_config.get('min_campeonatos', 3))
+        return self._exclusao('campeonato', 'campeonatos_excl', 'Campeonato', codigos, lucro, contagem)
+
+    def _jogadores(self, tipo, chave_config, lado, min_quantidade):
+        """Candidatos de exclusão de jogadores (a favor ou contra)"""
+        lucro_a, contagem_a = self.estatisticas.somas_grupos(f'jogador_{lado}_a')
+        lucro_b, contagem_b = self.estatisticas.somas_grupos(f'jogador_{lado}_b')
+        # Ranqueados pela soma dos dois lados; o delta removido desconta as linhas nos dois
+        codigos = self._prejudiciais(lucro_a + lucro_b, contagem_a + contagem_b, min_quantidade)
+        if not len(codigos):
+            return []
+        return self._exclusao(tipo, chave_config, f'jogador_{lado}_a', codigos, *self._removidos('jogador', lado))
+
+    def _apostas_a_favor(self):
+        if not self.busca_config.get('usar_excl_apostas_a_favor', True):
+            return []
+        return self._jogadores('apostas_a_favor', 'apostas_a_favor_excl', 'favor',
+                               self.min_entradas_config.get('min_apostas_a_favor', 3))
+
+    def _apostas_contra(self):
+        if not self.busca_config.get('usar_excl_apostas_contra', True):
+            return []
+        return self._jogadores('apostas_contra', 'apostas_contra_excl', 'contra',
+                               self.min_entradas_config.get('min_apostas_contra', 3))
+
+    def _confrontos(self):
+        if not self.busca_config.get('usar_excl_confrontos', True):
+            return []
+        lucro, contagem = self.estatisticas.somas_grupos('Confronto')
+        codigos = self._prejudiciais(lucro, contagem, self.min_entradas_config.get('min_confrontos', 3))
+        return self._exclusao('confronto', 'confrontos', 'Confronto', codigos, lucro, contagem)
+
+    def _tipos(self, tipo, chave_config, nomes, min_quantidade):
+        """Candidatos de exclusão por tipo (Favorito/Azarão, Mandante/Visitante)"""
+        candidatos = []
+        for nome in nomes:
+            lucro, contagem = self.estatisticas.somas_grupos(nome)
+            quantidade = int(contagem[0]) if len(contagem) else 0
+            if nome not in self.config[chave_config] and quantidade >= min_quantidade:
+                candidatos.append(Candidato(tipo, nome, self.lucro_total - lucro[0], self.total - quantidade,
+                                            self.config, ((chave_config, nome),)))
+        return candidatos
+
+    def _tipo_apostas(self):
+        if not self.busca_config.get('usar_excl_tipo_apostas', True) or not self.dataset.tem_tipo_aposta:
+            return []
+        return self._tipos('tipo_aposta', 'tipo_apostas_excl', ("Favorito", "Azarão"),
+                           self.min_entradas_config.get('min_tipo_apostas', 3))
+
+    def _tipo_local(self):
+        if not self.busca_config.get('usar_excl_tipo_local', True):
+            return []
+        return self._tipos('tipo_local', 'tipo_local_excl', ("Mandante", "Visitante"),
+                           self.min_entradas_config.get('min_tipo_local', 3))
+
+    def _times(self, tipo, chave_config, nome, lado, min_quantidade):
+        """Candidatos de exclusão de times (a favor ou contra)"""
+        codigos = self._prejudiciais(*self.estatisticas.somas_grupos(nome), min_quantidade)
+        if not len(codigos):
+            return []
+        return self._exclusao(tipo, chave_config, nome, codigos, *self._removidos('time', lado))
+
+    def _times_a_favor(self):
+        if not self.busca_config.get('usar_excl_times_a_favor', True) or not self.dataset.tem_times:
+            return []
+        return self._times('time_a_favor', 'times_a_favor_excl', 'time_escolhido', 'favor',
+                           self.min_entradas_config.get('min_times_a_favor', 3))
+
+    def _times_contra(self):
+        if not self.busca_config.get('usar_excl_times_contra', True) or not self.dataset.tem_times:
+            return []
+        return self._times('time_contra', 'times_contra_excl', 'time_adversario', 'contra',
+                           self.min_entradas_config.get('min_times_contra', 3))
+
+    def _valores_placar(self):
+        """Diferenças de placar como a busca original as via, inteiras ou float.
+
+        A coluna original era float quando as linhas em que foi calculada (as do
+        primeiro ajuste de placar) tinham placares inválidos; os limiares já
+        aplicados guardam esse tipo.
+        """
+        anteriores = [self.config[chave] for chave in ('diferenca_placar_min', 'diferenca_placar_max')
+                      if self.config[chave] is not None]
+        if anteriores:
+            tipo = type(anteriores[0])
+        else:
+            tipo = float if np.isnan(self.dataset.diferenca_placar[self.estatisticas.indices]).any() else int
+        return [tipo(valor) for valor in self.estatisticas.valores('diferenca_placar')]
+
+    def _diferenca_placar_min(self):
+        if not self.busca_config.get('usar_diferenca_placar_min', True) or self.dataset.diferenca_placar is None:
+            return []
+        return self._limiar('diferenca_placar_min', 'diferenca_placar', 'diferenca_placar_min',
+                            self._valores_placar(), limitar=True)
+
+    def _diferenca_placar_max(self):
+        if not self.busca_config.get('usar_diferenca_placar_max', True) or self.dataset.diferenca_placar is None:
+            return []
+        return self._limiar('diferenca_placar_max', 'diferenca_placar', 'diferenca_placar_max',
+                            self._valores_placar()[::-1], maior_igual=False, limitar=True)
+
+
+def escolher_ajuste(candidatos, roi_atual, limite_minimo, margem, avaliar):
+    """Escolher o ajuste de maior impacto no ROI, com desempate pela ordem dos candidatos
+
+    Os candidatos são ranqueados pelas somas aproximadas; só os que podem disputar
+    o primeiro lugar dentro da margem de arredondamento são materializados com
+    `avaliar(candidato)`, que devolve (lucro, entradas, resultado), e comparados
+    pelo ROI exato. Retorna (candidato, resultado) ou None.
+    """
+    viaveis = [c for c in candidatos if c.entradas >= limite_minimo]
+    if not viaveis:
+        return None
+
+    entradas = np.array([c.entradas for c in viaveis], dtype=float)
+    roi = np.array([c.lucro for c in viaveis], dtype=float) / entradas
+    erro = margem / entradas + 4 * EPS * np.abs(roi)
+
+    possiveis = roi + erro > roi_atual
+    if not possiveis.any():
+        return None
+    certos = roi - erro > roi_atual
+    piso = (roi - erro)[certos].max() if certos.any() else roi_atual
+    disputa = possiveis & (roi + erro >= piso)
+
+    melhor = None
+    for candidato, em_disputa in zip(viaveis, disputa):
+        if not em_disputa:
+            continue
+        lucro_teste, entradas_teste, resultado = avaliar(candidato)
+        if entradas_teste < limite_minimo:
+            continue
+        impacto = lucro_teste / entradas_teste - roi_atual
+        if impacto > 0 and (melhor is None or impacto > melhor[0]):
+            melhor = (impacto, candidato, resultado)
+
+    return (melhor[1], melhor[2]) if melhor else None
@@ -0,0 +1,20 @@
+"""Interface de progresso usada pelo analisador"""
+
+
+class ReporterProgresso:
+    """Recebe o progresso da busca e as mensagens de erro; por padrão não faz nada"""
+
+    def iniciar(self):
+        """Início de uma busca"""
+
+    def atualizar(self, fracao, mensagem):
+        """Andamento da busca (`fracao` entre 0 e 1)"""
+
+    def etapa(self, etapa):
+        """Etapa aceita pela busca (numero, ajuste, entradas, lucro, roi), assim que é escolhida"""
+
+    def concluir(self, mensagem):
+        """Fim da busca"""
+
+    def erro(self, mensagem):
+        """Erro que deve ser mostrado ao usuário"""
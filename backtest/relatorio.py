@@ -0,0 +1,261 @@
+"""Montagem e escrita do relatório Excel de uma etapa.
+
+As colunas de papel da tip são derivadas uma única vez sobre os arrays do
+dataset compilado. As planilhas agrupadas saem desse mesmo DataFrame.
+
+As planilhas são gravadas em modo write-only do openpyxl. Tabela, cabeçalho,
+formatos numéricos, cores de lucro/ROI e fórmulas de ROI são aplicados
+enquanto as linhas são emitidas. O arquivo não é regravado nem recarregado
+para ser formatado.
+"""
+
+import io
+import warnings
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.filters import AutoFilter
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+
+PLANILHAS_FORMATADAS = ["Tips Enviadas", "Campeonato", "Confronto", "Winrate 1", "Winrate 2",
+                        "Jogador", "Jogador Contra", "Jogador Favorito", "Jogador Azarão",
+                        "Tipo Aposta", "Tipo Local", "Linha", "Time", "Time Contra",
+                        "Placar Envio", "Diferença Placar"]
+
+# Planilhas agrupadas: colunas de lucro e ROI coloridas pelo sinal
+PLANILHAS_AGRUPADAS = PLANILHAS_FORMATADAS[1:]
+
+ESTILO_TABELA = "TableStyleLight1"
+
+FILL_CABECALHO = PatternFill(start_color="B2B2B2", end_color="B2B2B2", fill_type="solid")
+FONTE_CABECALHO = Font(color="FFFFFF", bold=True)
+FILL_VERDE = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+FONTE_VERDE = Font(color="006400", bold=True)
+FILL_VERMELHO = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+FONTE_VERMELHO = Font(color="8B0000", bold=True)
+
+
+def confronto_normalizado(jogador_a, jogador_b):
+    """Confronto "A vs B" com os jogadores em ordem alfabética, vazio quando falta algum"""
+    validos = (jogador_a.notna() & jogador_b.notna()).to_numpy()
+    texto_a = jogador_a.astype(str)
+    texto_b = jogador_b.astype(str)
+    em_ordem = (texto_a <= texto_b).to_numpy()
+    primeiro = pd.Series(np.where(em_ordem, texto_a, texto_b), dtype=object)
+    segundo = pd.Series(np.where(em_ordem, texto_b, texto_a), dtype=object)
+    return np.where(validos, (primeiro + " vs " + segundo).to_numpy(dtype=object), "")
+
+
+def derivar_colunas(dataset, df):
+    """Acrescentar a `df` as colunas de papel da tip e devolver as chaves extras de agrupamento.
+
+    Os papéis vêm dos arrays já calculados no dataset compilado; as chaves
+    devolvidas valem NaN/None nas linhas que ficam fora do grupo.
+    """
+    indices = df.index.to_numpy()
+    tip_a = dataset.tip_a[indices]
+    tip_b = dataset.tip_b[indices]
+    tip_favorito = dataset.tip_favorito[indices]
+    tip_azarao = dataset.tip_azarao[indices]
+    jogador_a = df["Jogador A"].to_numpy(dtype=object)
+    jogador_b = df["Jogador B"].to_numpy(dtype=object)
+
+    df["Confronto Normalizado"] = confronto_normalizado(df["Jogador A"], df["Jogador B"])
+    df["Jogador Contra"] = np.where(tip_a, jogador_b, np.where(tip_b, jogador_a, None))
+
+    if "Time A" in df.columns and "Time B" in df.columns:
+        time_a = df["Time A"].to_numpy(dtype=object)
+        time_b = df["Time B"].to_numpy(dtype=object)
+        df["Time a Favor"] = np.where(tip_a, time_a, np.where(tip_b, time_b, None))
+        df["Time Contra"] = np.where(tip_a, time_b, np.where(tip_b, time_a, None))
+    else:
+        df["Time a Favor"] = None
+        df["Time Contra"] = None
+
+    if "Placar Envio" in df.columns:
+        df["Diferença Placar"] = pd.array(dataset.diferenca_placar[indices], dtype="Int64")
+    else:
+        df["Diferença Placar"] = None
+
+    # Coluna ROI (será substituída por fórmula no Excel)
+    df["ROI"] = df["Lucro/Prej."]
+
+    tem_tipo_aposta = "Favorito" in df.columns and "Azarão" in df.columns
+    if tem_tipo_aposta:
+        df["Aposta Favor (Favorito/Azarão)"] = np.select([tip_favorito, tip_azarao], ["Favorito", "Azarão"], "N/A")
+    else:
+        df["Aposta Favor (Favorito/Azarão)"] = "N/A"
+    df["Tipo Local"] = np.select([tip_a, tip_b], ["Mandante", "Visitante"], "Não Classificado")
+
+    chaves = {"Jogador Escolhido": pd.Series(np.where(tip_a, jogador_a, np.where(tip_b, jogador_b, None)),
+                                             index=df.index, name="Jogador")}
+    if tem_tipo_aposta:
+        chaves["Favorito"] = df["Favorito"].where(tip_favorito)
+        chaves["Azarão"] = df["Azarão"].where(tip_azarao)
+        chaves["Tipo Aposta"] = pd.Series(np.select([tip_favorito, tip_azarao], ["Favorito", "Azarão"],
+                                                    "Não Classificado"), index=df.index, name="Tipo Aposta")
+    return chaves
+
+
+def resumir_grupos(df, chave, nome=None):
+    """Entradas, lucro e ROI por Torneio e chave (linhas com chave vazia ficam de fora)"""
+    if isinstance(chave, str):
+        chave = df[chave]
+    if nome is not None:
+        chave = chave.rename(nome)
+    tabela = df["Lucro/Prej."].groupby([df["Torneio"], chave]).agg(
+        Quantidade_Entradas="count",
+        Lucro_Prej="sum"
+    ).reset_index()
+    tabela["ROI (%)"] = (tabela["Lucro_Prej"] / tabela["Quantidade_Entradas"]).round(4)
+    return tabela
+
+
+def _texto_numero(valor):
+    """Texto de um número como o Excel o devolve ao reler o arquivo ("-1.0" vira "-1")"""
+    texto = "%.16g" % valor
+    return str(float(texto)) if any(c in texto for c in ".eE") else texto
+
+
+def largura_coluna(nome, serie):
+    """Largura da coluna pelo maior texto entre o cabeçalho e os valores distintos"""
+    valores = serie.dropna()
+    maior = len(str(nome))
+    if len(valores) and pd.api.types.is_numeric_dtype(valores) and not pd.api.types.is_bool_dtype(valores):
+        unicos = pd.unique(valores.to_numpy(dtype=float))
+        unicos = unicos[np.isfinite(unicos)]
+        if len(unicos):
+            maior = max(maior, max(len(_texto_numero(v)) for v in unicos.tolist()))
+    elif len(valores):
+        maior = max(maior, int(valores.drop_duplicates().astype(object).map(str).str.len().max()))
+    return maior * 1.2 if maior > 0 else 10
+
+
+def _celula(ws, fill=None, font=None, number_format=None):
+    """Célula modelo com estilo fixo; o write-only grava a célula ao receber a linha,
+    então o mesmo objeto pode ser reaproveitado em todas as linhas da coluna"""
+    celula = WriteOnlyCell(ws)
+    if fill is not None:
+        celula.fill = fill
+        celula.font = font
+    if number_format is not None:
+        celula.number_format = number_format
+    return celula
+
+
+def _formatar_sinal(ws, number_format):
+    """Formatação de lucro/ROI: formato numérico e verde/vermelho pelo sinal"""
+    positivo = _celula(ws, FILL_VERDE, FONTE_VERDE, number_format)
+    negativo = _celula(ws, FILL_VERMELHO, FONTE_VERMELHO, number_format)
+    neutro = _celula(ws, number_format=number_format)
+
+    def formatar(valor, linha):
+        if valor is None:
+            return None
+        try:
+            numero = float(valor)
+        except (ValueError, TypeError):
+            numero = 0
+        celula = positivo if numero > 0 else negativo if numero < 0 else neutro
+        celula.value = valor
+        return celula
+    return formatar
+
+
+def _formatar_resultado(ws):
+    """Coluna Resultado: verde/vermelho pelo texto (Green/Red)"""
+    verde = _celula(ws, FILL_VERDE, FONTE_VERDE)
+    vermelho = _celula(ws, FILL_VERMELHO, FONTE_VERMELHO)
+
+    def formatar(valor, linha):
+        if valor is None:
+            return None
+        texto = str(valor).lower()
+        celula = verde if "green" in texto else vermelho if "red" in texto else None
+        if celula is None:
+            return valor
+        celula.value = valor
+        return celula
+    return formatar
+
+
+def _formula_roi(ws, letra_lucro):
+    """Coluna ROI da planilha Tips Enviadas como fórmula sobre o lucro da linha"""
+    celula = _celula(ws, number_format='0.00%')
+
+    def formatar(valor, linha):
+        celula.value = f"={letra_lucro}{linha}/1"
+        return celula
+    return formatar
+
+
+def _escrever_planilha(wb, nome, df):
+    ws = wb.create_sheet(nome)
+    colunas = [str(col) for col in df.columns]
+    formatar = nome in PLANILHAS_FORMATADAS and len(df) > 0 and len(colunas) > 1
+
+    if not formatar:
+        ws.append(colunas)
+        for valores in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+            ws.append(list(valores))
+        return
+
+    ultima = f"{get_column_letter(len(colunas))}{len(df) + 1}"
+    referencia = f"A1:{ultima}"
+    tabela = Table(displayName=f"Table_{nome.replace(' ', '_')}", ref=referencia,
+                   tableColumns=[TableColumn(id=i, name=col) for i, col in enumerate(colunas, start=1)],
+                   autoFilter=AutoFilter(ref=referencia))
+    tabela.tableStyleInfo = TableStyleInfo(name=ESTILO_TABELA, showFirstColumn=False, showLastColumn=False,
+                                           showRowStripes=True, showColumnStripes=False)
+    with warnings.catch_warnings():
+        # O aviso do write-only pede as colunas da tabela, que já foram informadas acima
+        warnings.simplefilter("ignore")
+        ws.add_table(tabela)
+
+    # No write-only as larguras precisam estar definidas antes da primeira linha
+    for i, col in enumerate(df.columns, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = largura_coluna(col, df[col])
+
+    cabecalho = []
+    for col in colunas:
+        celula = WriteOnlyCell(ws, value=col)
+        celula.fill = FILL_CABECALHO
+        celula.font = FONTE_CABECALHO
+        cabecalho.append(celula)
+    ws.append(cabecalho)
+
+    posicoes = {col: i for i, col in enumerate(colunas)}
+    lucro = posicoes.get("Lucro_Prej", posicoes.get("Lucro/Prej."))
+    formatadores = []
+    if nome in PLANILHAS_AGRUPADAS:
+        if lucro is not None:
+            formatadores.append((lucro, _formatar_sinal(ws, '0.00')))
+        if "ROI (%)" in posicoes:
+            formatadores.append((posicoes["ROI (%)"], _formatar_sinal(ws, '0.0%')))
+    if nome == "Tips Enviadas":
+        if "Resultado" in posicoes:
+            formatadores.append((posicoes["Resultado"], _formatar_resultado(ws)))
+        if "ROI" in posicoes and lucro is not None:
+            formatadores.append((posicoes["ROI"], _formula_roi(ws, get_column_letter(lucro + 1))))
+
+    linhas = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    for numero, valores in enumerate(linhas, start=2):
+        valores = list(valores)
+        for posicao, formatador in formatadores:
+            valores[posicao] = formatador(valores[posicao], numero)
+        ws.append(valores)
+
+
+def escrever_relatorio(planilhas):
+    """Gravar as planilhas [(nome, DataFrame), ...] em um xlsx formatado, retornando os bytes"""
+    wb = Workbook(write_only=True)
+    for nome, df in planilhas:
+        _escrever_planilha(wb, nome, df)
+
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
@@ -0,0 +1,70 @@
+"""Índice das seleções iniciais (Torneio → Campeonato → Tip).
+
+Montado uma vez por dataset a partir dos códigos inteiros: guarda as opções de
+cada seletor já ordenadas e as entradas e o lucro de cada combinação, para que
+a interface monte os seletores e o resumo da seleção sem filtrar o DataFrame.
+"""
+
+import numpy as np
+import pandas as pd
+
+TODOS_TORNEIOS = "Todos os torneios"
+TODOS_CAMPEONATOS = "Todos os campeonatos"
+AMBOS = "Ambos"
+TIPS = ("Over", "Under")
+
+
+class IndiceSelecao:
+    """Opções e totais (entradas, lucro) de cada combinação torneio × campeonato × tip"""
+
+    def __init__(self, dataset):
+        torneio = dataset.codigos['Torneio']
+        campeonato = dataset.codigos.get('Campeonato', np.full(dataset.total, -1, dtype=np.int32))
+        tip = np.zeros(dataset.total, dtype=np.int8)
+        for posicao, codigo in enumerate(dataset.codificar(TIPS), start=1):
+            tip[dataset.codigos['Tip'] == codigo] = posicao
+
+        grupos = pd.DataFrame({'torneio': torneio, 'campeonato': campeonato, 'tip': tip,
+                               'lucro': dataset.lucro_exato}).groupby(['torneio', 'campeonato', 'tip'])
+        totais = grupos['lucro'].agg(['size', 'sum']).reset_index()
+
+        # Valores vazios (None) só entram nos níveis "Todos"
+        nomes_torneio = dataset.decodificar(totais['torneio'])
+        nomes_campeonato = dataset.decodificar(totais['campeonato'])
+
+        self._totais = {}
+        campeonatos = {TODOS_TORNEIOS: set()}
+        for t, c, k, entradas, lucro in zip(nomes_torneio, nomes_campeonato, totais['tip'],
+                                            totais['size'], totais['sum']):
+            niveis_torneio = (t, TODOS_TORNEIOS) if t is not None else (TODOS_TORNEIOS,)
+            niveis_campeonato = (c, TODOS_CAMPEONATOS) if c is not None else (TODOS_CAMPEONATOS,)
+            niveis_tip = (TIPS[k - 1], AMBOS) if k else (AMBOS,)
+            for chave_t in niveis_torneio:
+                opcoes = campeonatos.setdefault(chave_t, set())
+                if c is not None:
+                    opcoes.add(c)
+                for chave in ((chave_t, chave_c, chave_k) for chave_c in niveis_campeonato for chave_k in niveis_tip):
+                    anterior_entradas, anterior_lucro = self._totais.get(chave, (0, 0.0))
+                    self._totais[chave] = (anterior_entradas + int(entradas), anterior_lucro + float(lucro))
+
+        self.torneios = sorted(t for t in campeonatos if t != TODOS_TORNEIOS) + [TODOS_TORNEIOS]
+        self._campeonatos = {t: sorted(valores) + [TODOS_CAMPEONATOS] for t, valores in campeonatos.items()}
+
+    def campeonatos(self, torneio):
+        """Campeonatos do torneio, com "Todos os campeonatos" por último"""
+        return self._campeonatos.get(torneio, [TODOS_CAMPEONATOS])
+
+    def tips(self, torneio, campeonato):
+        """Tips disponíveis (Over/Under, e "Ambos" quando há as duas) na seleção"""
+        opcoes = [tip for tip in TIPS if self.entradas(torneio, campeonato, tip)]
+        if len(opcoes) > 1:
+            opcoes.append(AMBOS)
+        return opcoes
+
+    def totais(self, torneio, campeonato=TODOS_CAMPEONATOS, tip=None):
+        """Entradas e lucro da seleção (tip None ou "Ambos" considera todas as linhas)"""
+        return self._totais.get((torneio, campeonato, tip or AMBOS), (0, 0.0))
+
+    def entradas(self, torneio, campeonato=TODOS_CAMPEONATOS, tip=None):
+        """Quantidade de entradas da seleção"""
+        return self.totais(torneio, campeonato, tip)[0]
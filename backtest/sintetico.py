@@ -0,0 +1,74 @@
+"""Gerador de planilhas sintéticas no formato exportado pelo TipManager"""
+
+import numpy as np
+import pandas as pd
+
+
+def gerar_planilha(linhas, semente=0, fracao_over_under=0.1):
+    """DataFrame com `linhas` tips sintéticas e todas as colunas lidas pela análise.
+
+    Jogadores, campeonatos e times crescem com a raiz do tamanho, e cada um tem
+    um viés próprio no resultado, para que a busca encontre filtros a aplicar.
+    """
+    rng = np.random.default_rng(semente)
+    raiz = np.sqrt(linhas)
+
+    torneios = np.array([f"Liga {letra}" for letra in "ABCDEF"][:max(2, min(6, int(raiz) // 40 + 2))])
+    campeonatos = np.array([f"Campeonato {i}" for i in range(int(np.clip(raiz / 2, 10, 500)))])
+    jogadores = np.array([f"Jogador {i}" for i in range(int(np.clip(raiz * 3, 40, 20000)))])
+    times = np.array([f"Time {i}" for i in range(int(np.clip(raiz, 20, 2000)))])
+
+    jogador_a = rng.integers(0, len(jogadores), linhas)
+    jogador_b = (jogador_a + rng.integers(1, len(jogadores), linhas)) % len(jogadores)
+    time_a = rng.integers(0, len(times), linhas)
+    time_b = rng.integers(0, len(times), linhas)
+    campeonato = rng.integers(0, len(campeonatos), linhas)
+
+    # Tip no jogador A ou B; uma fração vira Over/Under
+    tip_em_a = rng.random(linhas) < 0.5
+    tip = np.where(tip_em_a, jogadores[jogador_a], jogadores[jogador_b]).astype(object)
+    over_under = rng.random(linhas) < fracao_over_under
+    tip[over_under] = np.where(rng.random(over_under.sum()) < 0.5, "Over", "Under")
+
+    favorito_em_a = rng.random(linhas) < 0.5
+    favorito = np.where(favorito_em_a, jogadores[jogador_a], jogadores[jogador_b])
+    azarao = np.where(favorito_em_a, jogadores[jogador_b], jogadores[jogador_a])
+
+    winrate1 = rng.integers(30, 80, linhas) + rng.choice([0.0, 0.5], linhas)
+    winrate2 = rng.integers(30, 80, linhas).astype(float)
+
+    # Probabilidade de green com viés por jogador, campeonato e time
+    vies_jogador = rng.normal(0, 0.08, len(jogadores))
+    vies_campeonato = rng.normal(0, 0.05, len(campeonatos))
+    vies_time = rng.normal(0, 0.05, len(times))
+    jogador_tip = np.where(tip_em_a, jogador_a, jogador_b)
+    probabilidade = (0.5 + (winrate1 - 55) / 1000 + np.where(over_under, 0, vies_jogador[jogador_tip])
+                     + vies_campeonato[campeonato] + vies_time[time_a])
+    green = rng.random(linhas) < probabilidade
+    odd = np.round(rng.uniform(0.75, 1.0, linhas), 2)
+    lucro = np.where(green, odd, -1.0)
+    lucro[rng.random(linhas) < 0.03] = 0.0
+
+    gols_a = rng.integers(0, 6, linhas).astype(str)
+    gols_b = rng.integers(0, 6, linhas).astype(str)
+    placar = np.char.add(np.char.add(gols_a, "-"), gols_b).astype(object)
+    invalido = rng.random(linhas) < 0.02
+    placar[invalido] = None
+
+    return pd.DataFrame({
+        "Torneio": rng.choice(torneios, linhas),
+        "Campeonato": campeonatos[campeonato],
+        "Jogador A": jogadores[jogador_a],
+        "Jogador B": jogadores[jogador_b],
+        "Time A": times[time_a],
+        "Time B": times[time_b],
+        "Tip": tip,
+        "Favorito": favorito,
+        "Azarão": azarao,
+        "Linha": rng.choice(["-1.5", "-0.5", "+0.5", "+1.5"], linhas),
+        "Placar Envio": placar,
+        "Winrate 1": np.char.add(winrate1.astype(str), "%"),
+        "Winrate 2": np.char.add(winrate2.astype(str), "%"),
+        "Lucro/Prej.": lucro,
+        "Resultado": np.where(lucro > 0, "Green", np.where(lucro < 0, "Red", "Void")),
+    })
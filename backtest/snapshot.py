@@ -0,0 +1,276 @@
+"""Snapshot colunar da planilha já tipada, gravado em disco.
+
+Cada coluna vira um `.npy` lido sem pickle. As colunas numéricas e de data são
+gravadas como estão. As de texto (ou mistas) viram códigos inteiros, e os
+valores únicos vão para um JSON, com marca para datas e horas. Um snapshot é
+identificado pelo hash do arquivo original, então o mesmo upload nunca precisa
+ser lido pelo openpyxl de novo.
+
+Os arrays do dataset compilado podem ser gravados junto (`salvar_compilado`).
+`abrir_compilado` os mapeia em memória somente leitura, sem montar DataFrame:
+processos que abrem o mesmo snapshot dividem as páginas do arquivo, e as linhas
+da planilha só são lidas quando um relatório precisa delas.
+"""
+
+import datetime
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .dataset import DatasetCompilado
+
+DIRETORIO_SNAPSHOTS = os.environ.get("HANDICAP_SNAPSHOTS", ".snapshots")
+VERSAO_SNAPSHOT = 3
+
+# Arrays do dataset compilado gravados por `salvar_compilado` (os dicionários, um arquivo por chave)
+ARRAYS_COMPILADOS = ("tip_a", "tip_b", "tip_favorito", "tip_azarao", "winrate1", "winrate2",
+                     "lucro", "lucro_exato", "diferenca_placar")
+DICIONARIOS_COMPILADOS = ("codigos", "_chaves_grupos", "_codigos_grupos")
+
+
+def caminho_snapshot(chave, diretorio=None):
+    """Pasta do snapshot de um arquivo"""
+    return os.path.join(diretorio or DIRETORIO_SNAPSHOTS, chave)
+
+
+def _ler_meta(origem):
+    with open(os.path.join(origem, "meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _gravar_meta(destino, meta):
+    with open(os.path.join(destino, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+def _gravar_em(destino, gravar):
+    """Gravar a pasta `destino` por inteiro em uma pasta temporária, que então toma o lugar dela"""
+    try:
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporario = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(destino))
+    except OSError:
+        return None
+    try:
+        gravar(temporario)
+        # Versão anterior (ou incompleta) no lugar: substituída pela nova
+        shutil.rmtree(destino, ignore_errors=True)
+        os.replace(temporario, destino)
+    except (OSError, TypeError, ValueError):
+        shutil.rmtree(temporario, ignore_errors=True)
+        return None
+    return destino
+
+
+def _atual(origem):
+    try:
+        return _ler_meta(origem).get("versao") == VERSAO_SNAPSHOT
+    except (OSError, ValueError):
+        return False
+
+
+def _valor_json(valor):
+    """Valor único de uma coluna codificada em JSON; datas e horas levam a marca do tipo"""
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, (str, bool, int, float)):
+        return valor
+    if isinstance(valor, pd.Timestamp):
+        return {"timestamp": valor.isoformat()}
+    if isinstance(valor, datetime.datetime):
+        return {"datetime": valor.isoformat()}
+    if isinstance(valor, datetime.date):
+        return {"date": valor.isoformat()}
+    if isinstance(valor, datetime.time):
+        return {"time": valor.isoformat()}
+    if isinstance(valor, datetime.timedelta):
+        return {"timedelta": valor.total_seconds()}
+    raise TypeError(f"Valor sem representação no snapshot: {type(valor).__name__}")
+
+
+def _valor_de_json(valor):
+    if not isinstance(valor, dict):
+        return valor
+    (tipo, texto), = valor.items()
+    if tipo == "timestamp":
+        return pd.Timestamp(texto)
+    if tipo == "datetime":
+        return datetime.datetime.fromisoformat(texto)
+    if tipo == "date":
+        return datetime.date.fromisoformat(texto)
+    if tipo == "time":
+        return datetime.time.fromisoformat(texto)
+    if tipo == "timedelta":
+        return datetime.timedelta(seconds=texto)
+    raise ValueError(f"Tipo desconhecido no snapshot: {tipo}")
+
+
+def salvar_snapshot(df, chave, diretorio=None):
+    """Gravar o snapshot de `df`; falhas de escrita não interrompem a carga"""
+    destino = caminho_snapshot(chave, diretorio)
+    if _atual(destino):
+        return destino
+
+    def gravar(temporario):
+        colunas = []
+        for i, col in enumerate(df.columns):
+            serie = df[col]
+            if isinstance(serie.dtype, np.dtype) and serie.dtype.kind in "biufcmM":
+                np.save(os.path.join(temporario, f"{i}.npy"), serie.to_numpy(), allow_pickle=False)
+                colunas.append({"nome": col, "tipo": "numerico"})
+            else:
+                codigos, valores = pd.factorize(serie.to_numpy(dtype=object))
+                np.save(os.path.join(temporario, f"{i}.npy"), codigos.astype(np.int32), allow_pickle=False)
+                with open(os.path.join(temporario, f"{i}_valores.json"), "w", encoding="utf-8") as f:
+                    json.dump([_valor_json(valor) for valor in valores], f, ensure_ascii=False)
+                colunas.append({"nome": col, "tipo": "codificado", "dtype": str(serie.dtype)})
+        _gravar_meta(temporario, {"versao": VERSAO_SNAPSHOT, "linhas": len(df), "colunas": colunas})
+
+    return _gravar_em(destino, gravar)
+
+
+def _decodificar(codigos, valores):
+    if not len(valores):
+        return np.full(len(codigos), np.nan, dtype=object)
+    return np.where(codigos >= 0, valores[np.where(codigos >= 0, codigos, 0)], np.nan)
+
+
+def _valores_de_json(unicos):
+    valores = np.empty(len(unicos), dtype=object)
+    valores[:] = [_valor_de_json(valor) for valor in unicos]
+    return valores
+
+
+def _ler_colunas(origem, indices=None):
+    """DataFrame do snapshot em `origem`; com `indices`, só essas linhas, lidas dos arquivos mapeados"""
+    meta = _ler_meta(origem)
+    if meta.get("versao") != VERSAO_SNAPSHOT:
+        return None
+
+    dados = {}
+    for i, coluna in enumerate(meta["colunas"]):
+        if indices is None:
+            array = np.load(os.path.join(origem, f"{i}.npy"), allow_pickle=False)
+        else:
+            array = np.load(os.path.join(origem, f"{i}.npy"), mmap_mode="r", allow_pickle=False)[indices]
+        if coluna["tipo"] == "numerico":
+            dados[coluna["nome"]] = array
+        else:
+            with open(os.path.join(origem, f"{i}_valores.json"), encoding="utf-8") as f:
+                valores = _valores_de_json(json.load(f))
+            serie = pd.Series(_decodificar(array, valores), dtype=object)
+            if coluna["dtype"] != "object":
+                serie = serie.astype(coluna["dtype"])
+            dados[coluna["nome"]] = serie
+    df = pd.DataFrame(dados)
+    if indices is not None:
+        df.index = pd.Index(indices)
+    return df
+
+
+def ler_snapshot(chave, diretorio=None, indices=None):
+    """DataFrame salvo no snapshot (só as linhas `indices`, se informadas), ou None se não houver um válido"""
+    try:
+        return _ler_colunas(caminho_snapshot(chave, diretorio), indices)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def salvar_compilado(dataset, diretorio=None):
+    """Gravar os arrays do dataset compilado na pasta do seu snapshot, que precisa existir.
+
+    Retorna a pasta do snapshot (o argumento de `abrir_compilado`), ou None se
+    não der para gravar.
+    """
+    origem = caminho_snapshot(dataset.chave, diretorio)
+    if dataset.chave is None or not _atual(origem):
+        return None
+    destino = os.path.join(origem, "compilado")
+    if _atual(destino):
+        return origem
+
+    # Estruturas calculadas sob demanda entram já prontas
+    dataset.chaves_grupos()
+
+    def gravar(temporario):
+        arrays = [(nome, None, getattr(dataset, nome)) for nome in ARRAYS_COMPILADOS
+                  if getattr(dataset, nome) is not None]
+        arrays += [(nome, chave, array) for nome in DICIONARIOS_COMPILADOS
+                   for chave, array in getattr(dataset, nome).items()]
+        for i, (_, _, array) in enumerate(arrays):
+            np.save(os.path.join(temporario, f"{i}.npy"), np.asarray(array), allow_pickle=False)
+        _gravar_meta(temporario, {
+            "versao": VERSAO_SNAPSHOT,
+            "chave": dataset.chave,
+            "total": dataset.total,
+            "colunas": dataset.colunas,
+            "vocabulario": [_valor_json(valor) for valor in dataset.vocabulario],
+            "arrays": [[nome, chave] for nome, chave, _ in arrays],
+        })
+
+    return origem if _gravar_em(destino, gravar) is not None else None
+
+
+def abrir_compilado(origem):
+    """Dataset compilado gravado por `salvar_compilado` na pasta `origem`, ou None se não houver um válido"""
+    try:
+        return DatasetMapeado(origem)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+class DatasetMapeado(DatasetCompilado):
+    """Dataset compilado aberto do disco: arrays mapeados somente leitura, DataFrame só sob demanda.
+
+    Não passa pelo `__init__` de `DatasetCompilado`; os atributos que ele
+    calcularia vêm prontos dos arquivos.
+    """
+
+    def __init__(self, origem):
+        pasta = os.path.join(origem, "compilado")
+        meta = _ler_meta(pasta)
+        if meta.get("versao") != VERSAO_SNAPSHOT or not _atual(origem):
+            raise ValueError("Snapshot compilado de outra versão")
+
+        self.origem_snapshot = origem
+        self.chave = meta["chave"]
+        self.origem = "snapshot"
+        self.tempo_leitura = None
+        self.total = meta["total"]
+        self.colunas = meta["colunas"]
+        self.vocabulario = _valores_de_json(meta["vocabulario"])
+        self._posicoes = {valor: codigo for codigo, valor in enumerate(self.vocabulario)}
+        self.diferenca_placar = None
+        for nome in DICIONARIOS_COMPILADOS:
+            setattr(self, nome, {})
+        for i, (nome, chave) in enumerate(meta["arrays"]):
+            array = np.load(os.path.join(pasta, f"{i}.npy"), mmap_mode="r", allow_pickle=False).view(np.ndarray)
+            if chave is None:
+                setattr(self, nome, array)
+            else:
+                getattr(self, nome)[chave] = array
+        self.tem_times = 'Time A' in self.codigos and 'Time B' in self.codigos
+        self.tem_tipo_aposta = 'Favorito' in self.codigos and 'Azarão' in self.codigos
+        self._indice_selecao = None
+        self._df = None
+
+    @property
+    def df(self):
+        """Planilha inteira, lida do snapshot na primeira consulta"""
+        if self._df is None:
+            self._df = self.linhas(np.arange(self.total))
+        return self._df
+
+    def linhas(self, indices):
+        """Linhas `indices` lidas do snapshot, com os textos das colunas codificadas vindos do vocabulário"""
+        if self._df is not None:
+            return self._df.iloc[indices]
+        df = _ler_colunas(self.origem_snapshot, np.asarray(indices))
+        for col in self.colunas:
+            # Como em `DatasetCompilado`: a coluna de confronto derivada e os textos saem dos códigos
+            if col not in df.columns or pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+                df[col] = self.decodificar(self.codigos[col][indices], vazio=np.nan)
+        return df
@@ -0,0 +1,203 @@
+"""Análises executadas em segundo plano, fora da thread da interface.
+
+Cada análise enviada vira uma `TarefaAnalise`, executada por um analisador
+próprio (`BacktestAnalyzer.derivar`) em um pool de poucas threads. A interface
+consulta `situacao()` para mostrar o progresso, pode cancelar a tarefa (a busca
+para na próxima etapa e o estado fica salvo para continuar) e, no fim, adota o
+resultado na sessão. As análises pesadas têm um pool próprio e menor, para que
+uma busca grande não ocupe todos os workers.
+
+As tarefas ficam registradas pela sessão que as enviou e pela chave da busca
+(arquivo, seleção e configuração): a sessão reencontra a sua tarefa em
+andamento ou o resultado ainda não adotado, mas nunca vê, adota ou cancela a
+tarefa de outra sessão com o mesmo arquivo e a mesma seleção.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .controle import PAUSA
+from .progresso import ReporterProgresso
+
+NA_FILA = "na_fila"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+CANCELADA = "cancelada"
+FALHOU = "falhou"
+
+ATIVAS = (NA_FILA, EXECUTANDO)
+
+
+class ReporterTarefa(ReporterProgresso):
+    """Progresso e erros guardados na tarefa, para a interface consultar"""
+
+    def __init__(self):
+        self.fracao = 0.0
+        self.mensagem = ""
+        self.erros = []
+        self.etapas = []
+
+    def iniciar(self):
+        self.fracao = 0.0
+        self.etapas = []
+
+    def atualizar(self, fracao, mensagem):
+        self.fracao = fracao
+        self.mensagem = mensagem
+
+    def etapa(self, etapa):
+        # Só acrescenta: a interface lê a lista de outra thread enquanto a busca anda
+        self.etapas.append(etapa)
+
+    def concluir(self, mensagem):
+        self.fracao = 1.0
+        self.mensagem = mensagem
+
+    def erro(self, mensagem):
+        self.erros.append(mensagem)
+
+
+class TarefaAnalise:
+    """Uma análise (nova ou retomada) de um analisador próprio, com progresso e cancelamento"""
+
+    def __init__(self, analisador, selecao, roi_desejado_pct, retomar=False, pesada=False, sessao=None):
+        self.analisador = analisador
+        self.selecao = selecao
+        self.roi_desejado_pct = roi_desejado_pct
+        self.retomar = retomar
+        self.pesada = pesada
+        self.sessao = sessao
+        self.chave = (sessao, analisador.chave_busca(*selecao))
+        self.controle = analisador.novo_controle()
+        self.reporter = analisador.reporter = ReporterTarefa()
+        self.estado = NA_FILA
+        self.resultado = None
+        self.adotada = False
+        self._trava = threading.Lock()
+
+    @property
+    def ativa(self):
+        return self.estado in ATIVAS
+
+    def cancelar(self):
+        """Cancelar antes de começar, ou parar a busca na próxima etapa (o estado fica salvo)"""
+        self.controle.pausar()
+
+    def situacao(self):
+        """Estado, progresso, etapas aceitas até agora, melhor ROI e candidatos avaliados por segundo"""
+        situacao = {
+            'estado': self.estado,
+            'pesada': self.pesada,
+            'fracao': self.reporter.fracao,
+            'mensagem': self.reporter.mensagem,
+            'etapas': list(self.reporter.etapas),
+            'resultado': self.resultado,
+        }
+        if self.estado == NA_FILA:
+            situacao.update(etapa=0, melhor_roi=None, avaliacoes=0, decorrido=0.0, avaliacoes_por_s=0.0)
+        else:
+            situacao.update(self.analisador.progresso())
+        return situacao
+
+    def executar(self):
+        try:
+            self._executar()
+        finally:
+            # O resultado não precisa do dataset: a referência volta ao armazém assim que a busca termina
+            self.analisador.liberar_dataset()
+            self.analisador.dataset = None
+
+    def _executar(self):
+        if self.controle.motivo_parada() == PAUSA:
+            self.estado = CANCELADA
+            self.resultado = (False, "Análise cancelada antes de começar")
+            return
+        self.estado = EXECUTANDO
+        analise = self.analisador.retomar_analise if self.retomar else self.analisador.iniciar_analise
+        try:
+            self.resultado = analise(*self.selecao, self.roi_desejado_pct, controle=self.controle)
+        except Exception as e:
+            self.resultado = (False, f"Erro durante análise: {e}")
+        if not self.resultado[0]:
+            self.estado = FALHOU
+        elif self.analisador.interrupcao == PAUSA:
+            self.estado = CANCELADA
+        else:
+            self.estado = CONCLUIDA
+
+    def adotar(self, analisador):
+        """Levar o resultado da tarefa terminada para o analisador da sessão (uma única vez)"""
+        with self._trava:
+            if self.adotada or self.ativa or not self.analisador.etapas_filtros:
+                return False
+            if not analisador.adotar_resultados(self.analisador):
+                return False
+            self.adotada = True
+        return True
+
+
+class FilaAnalises:
+    """Pool de análises em segundo plano, com limite separado para as pesadas.
+
+    Uma análise é pesada quando as entradas da seleção vezes a largura do feixe
+    (1 na busca gulosa) chegam a `custo_pesada`. Guarda as últimas
+    `max_registradas` tarefas terminadas para quem voltar a procurá-las.
+    """
+
+    def __init__(self, max_tarefas=2, max_pesadas=1, custo_pesada=200_000, max_registradas=32):
+        self.custo_pesada = custo_pesada
+        self.max_registradas = max_registradas
+        self._leves = ThreadPoolExecutor(max_workers=max_tarefas, thread_name_prefix="analises")
+        self._pesadas = ThreadPoolExecutor(max_workers=max_pesadas, thread_name_prefix="analises-pesadas")
+        self._tarefas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def enviar(self, analisador, torneio, campeonato, tip, roi_desejado_pct, retomar=False, sessao=None):
+        """Enfileirar a análise de `analisador` (de `derivar`) para a `sessao`.
+
+        A mesma busca já em andamento na mesma sessão é reaproveitada.
+        """
+        selecao = (torneio, campeonato, tip)
+        with self._trava:
+            existente = self._tarefas.get((sessao, analisador.chave_busca(*selecao)))
+            if existente is not None and existente.ativa:
+                return existente
+
+            tarefa = TarefaAnalise(analisador, selecao, roi_desejado_pct, retomar,
+                                   pesada=self.custo(analisador, *selecao) >= self.custo_pesada, sessao=sessao)
+            self._tarefas.pop(tarefa.chave, None)
+            self._tarefas[tarefa.chave] = tarefa
+            self._esquecer_terminadas()
+        (self._pesadas if tarefa.pesada else self._leves).submit(tarefa.executar)
+        return tarefa
+
+    def custo(self, analisador, torneio, campeonato, tip):
+        """Entradas da seleção vezes os estados mantidos por etapa"""
+        entradas = analisador.obter_resumo_selecao(torneio, campeonato, tip)['entradas']
+        if analisador.estrategia_config.get('modo') == 'feixe':
+            return entradas * max(1, int(analisador.estrategia_config.get('largura_feixe', 5)))
+        return entradas
+
+    def tarefa(self, chave, sessao=None):
+        """Tarefa da `sessao` registrada para a chave da busca (em andamento ou terminada e não adotada)"""
+        with self._trava:
+            tarefa = self._tarefas.get((sessao, chave))
+        if tarefa is None or tarefa.adotada:
+            return None
+        return tarefa
+
+    def estatisticas(self):
+        """Quantidade de tarefas na fila e em execução, por tipo"""
+        with self._trava:
+            tarefas = list(self._tarefas.values())
+        return {
+            'na_fila': sum(1 for tarefa in tarefas if tarefa.estado == NA_FILA),
+            'executando': sum(1 for tarefa in tarefas if tarefa.estado == EXECUTANDO),
+            'pesadas_ativas': sum(1 for tarefa in tarefas if tarefa.pesada and tarefa.ativa),
+        }
+
+    def _esquecer_terminadas(self):
+        terminadas = [chave for chave, tarefa in self._tarefas.items() if not tarefa.ativa]
+        for chave in terminadas[:max(0, len(terminadas) - self.max_registradas)]:
+            del self._tarefas[chave]
@@ -0,0 +1,52 @@
+"""Planilhas sintéticas e analisadores isolados para os testes"""
+
+import io
+
+import pytest
+
+from backtest.analisador import BacktestAnalyzer
+from backtest.carga import carregar_dataset
+from backtest.sintetico import gerar_planilha
+
+SELECAO = ("Todos os torneios", "Todos os campeonatos", None)
+
+
+def conteudo_planilha(linhas, semente=0, formato="csv"):
+    """Bytes de uma planilha sintética, como viriam de um upload"""
+    arquivo = io.BytesIO()
+    df = gerar_planilha(linhas, semente)
+    if formato == "csv":
+        df.to_csv(arquivo, index=False)
+    else:
+        df.to_excel(arquivo, index=False)
+    return arquivo.getvalue()
+
+
+def passos(analisador):
+    """Etapas da busca como tuplas comparáveis"""
+    return [(etapa['ajuste'], int(etapa['entradas']), round(float(etapa['lucro']), 6))
+            for etapa in analisador.etapas_filtros]
+
+
+@pytest.fixture(scope="session")
+def planilha_csv():
+    return conteudo_planilha(1500)
+
+
+@pytest.fixture
+def novo_analisador(tmp_path):
+    """Fábrica de analisadores com snapshots e checkpoints no diretório temporário do teste"""
+    diretorio_snapshots = str(tmp_path / "snapshots")
+
+    def carregador(chave, conteudo, nome_arquivo):
+        return carregar_dataset(conteudo, nome_arquivo, chave=chave, diretorio_snapshots=diretorio_snapshots)
+
+    def criar(conteudo, nome_arquivo="sintetico.csv"):
+        analisador = BacktestAnalyzer(carregador=carregador, config_file="",
+                                      diretorio_checkpoints=str(tmp_path / "checkpoints"))
+        arquivo = io.BytesIO(conteudo)
+        arquivo.name = nome_arquivo
+        assert analisador.carregar_arquivo(arquivo)
+        return analisador
+
+    return criar
@@ -0,0 +1,12 @@
+import pandas as pd
+import pytest
+
+from backtest.carga import ler_planilha
+from conftest import conteudo_planilha
+
+
+@pytest.mark.parametrize("semente", [0, 1])
+def test_excel_e_csv_iguais(semente):
+    csv = ler_planilha(conteudo_planilha(1500, semente), "sintetico.csv")
+    excel = ler_planilha(conteudo_planilha(1500, semente, formato="xlsx"), "sintetico.xlsx")
+    pd.testing.assert_frame_equal(csv, excel)
@@ -0,0 +1,64 @@
+import glob
+import json
+import os
+
+import pytest
+
+from conftest import SELECAO
+
+
+def resultado(analisador):
+    etapas = [(e['ajuste'], e['entradas'], e['lucro'], e['roi']) for e in analisador.etapas_filtros]
+    fronteira = [(p['entradas'], p['roi']) for p in analisador.fronteira_pareto]
+    return etapas, analisador.melhor_etapa, fronteira
+
+
+def preparar(analisador, modo, max_avaliacoes=0):
+    analisador.estrategia_config.update(modo=modo, largura_feixe=3, max_avaliacoes=max_avaliacoes)
+    for chave in analisador.min_entradas_config:
+        analisador.min_entradas_config[chave] = 3
+    return analisador
+
+
+@pytest.mark.parametrize("modo", ['gulosa', 'feixe'])
+def test_busca_retomada_igual_a_continua(planilha_csv, novo_analisador, modo):
+    continua = preparar(novo_analisador(planilha_csv), modo)
+    assert continua.iniciar_analise(*SELECAO, 15)[0]
+
+    # Cada parte roda em um analisador novo, como uma sessão que volta depois
+    parcial = preparar(novo_analisador(planilha_csv), modo, max_avaliacoes=200)
+    assert parcial.iniciar_analise(*SELECAO, 15)[0]
+    partes = 1
+    while parcial.interrupcao is not None:
+        assert parcial.checkpoint_disponivel(*SELECAO)
+        parcial = preparar(novo_analisador(planilha_csv), modo, max_avaliacoes=200)
+        assert parcial.retomar_analise(*SELECAO, 15)[0]
+        partes += 1
+
+    assert partes > 1
+    assert not parcial.checkpoint_disponivel(*SELECAO)
+    assert resultado(parcial) == resultado(continua)
+
+
+@pytest.mark.parametrize("adulterar", ['linhas', 'versao', 'arquivo'])
+def test_checkpoint_invalido_recomeca_a_busca(planilha_csv, novo_analisador, tmp_path, adulterar):
+    interrompida = preparar(novo_analisador(planilha_csv), 'gulosa', max_avaliacoes=200)
+    assert interrompida.iniciar_analise(*SELECAO, 15)[0]
+    assert interrompida.interrupcao is not None
+    caminho_json, = glob.glob(os.path.join(tmp_path, "checkpoints", "*.json"))
+    if adulterar == 'linhas':
+        with open(caminho_json[:-len(".json")] + ".npz", "ab") as f:
+            f.write(b"\0")
+    else:
+        with open(caminho_json, encoding="utf-8") as f:
+            dados = json.load(f)
+        dados[adulterar] = 0
+        with open(caminho_json, "w", encoding="utf-8") as f:
+            json.dump(dados, f)
+
+    retomada = preparar(novo_analisador(planilha_csv), 'gulosa')
+    sucesso, mensagem = retomada.retomar_analise(*SELECAO, 15)
+    assert sucesso and "recomeçou do início" in mensagem
+    continua = preparar(novo_analisador(planilha_csv), 'gulosa')
+    assert continua.iniciar_analise(*SELECAO, 15)[0]
+    assert resultado(retomada) == resultado(continua)
@@ -0,0 +1,32 @@
+import pytest
+
+from conftest import SELECAO, conteudo_planilha, passos
+
+
+def analisar(analisador, modo, largura=5):
+    analisador.estrategia_config.update(modo=modo, largura_feixe=largura)
+    sucesso, mensagem = analisador.iniciar_analise(*SELECAO, 15)
+    assert sucesso, mensagem
+    return analisador
+
+
+def test_largura_1_igual_a_gulosa(planilha_csv, novo_analisador):
+    gulosa = analisar(novo_analisador(planilha_csv), 'gulosa')
+    feixe = analisar(novo_analisador(planilha_csv), 'feixe', 1)
+    assert len(gulosa.etapas_filtros) > 1
+    assert passos(feixe) == passos(gulosa)
+    assert feixe.melhor_etapa == gulosa.melhor_etapa
+
+
+@pytest.mark.parametrize("semente", [0, 1, 2])
+@pytest.mark.parametrize("minimo", [1, 3])
+def test_feixe_nunca_pior_que_gulosa(novo_analisador, semente, minimo):
+    conteudo = conteudo_planilha(600, semente)
+    resultados = {}
+    for modo, largura in (('gulosa', 1), ('feixe', 2), ('feixe', 4)):
+        analisador = novo_analisador(conteudo)
+        for chave in analisador.min_entradas_config:
+            analisador.min_entradas_config[chave] = minimo
+        resultados[modo, largura] = analisar(analisador, modo, largura).melhor_roi
+    gulosa = resultados['gulosa', 1]
+    assert all(roi >= gulosa for roi in resultados.values()), resultados
@@ -0,0 +1,33 @@
+"""Busca gulosa comparada com as etapas do motor anterior à refatoração.
+
+`dados/passos_originais.json` foi gerado pelo app original (sem os cortes de
+candidatos por família, removidos de propósito depois) sobre as mesmas
+planilhas sintéticas em .xlsx.
+"""
+
+import json
+import os
+
+import pytest
+
+from conftest import conteudo_planilha, passos
+
+with open(os.path.join(os.path.dirname(__file__), "dados", "passos_originais.json"), encoding="utf-8") as f:
+    CASOS = json.load(f)
+
+
+@pytest.fixture(scope="module")
+def planilhas():
+    return {semente: conteudo_planilha(1500, semente, formato="xlsx") for semente in {c['semente'] for c in CASOS}}
+
+
+@pytest.mark.parametrize("caso", CASOS, ids=lambda c: f"{c['semente']}-{c['tip']}-{len(c['busca'])}-{c['minimo']}")
+def test_gulosa_igual_ao_motor_original(planilhas, novo_analisador, caso):
+    analisador = novo_analisador(planilhas[caso['semente']], "sintetico.xlsx")
+    analisador.busca_config.update(caso['busca'])
+    if caso['minimo'] is not None:
+        for chave in analisador.min_entradas_config:
+            analisador.min_entradas_config[chave] = caso['minimo']
+
+    assert analisador.iniciar_analise("Todos os torneios", "Todos os campeonatos", caso['tip'], 15)[0]
+    assert passos(analisador) == [tuple(passo) for passo in caso['passos']]
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import cli
+from backtest.carga import ler_planilha
+from backtest.snapshot import caminho_snapshot, ler_snapshot, salvar_compilado, salvar_snapshot
+from conftest import SELECAO, conteudo_planilha, passos
+
+
+@pytest.mark.parametrize("formato", ['csv', 'xlsx'])
+def test_snapshot_ida_e_volta(tmp_path, formato):
+    df = ler_planilha(conteudo_planilha(800, semente=1, formato=formato), f"sintetico.{formato}")
+    assert salvar_snapshot(df, "chave", str(tmp_path)) is not None
+
+    lido = ler_snapshot("chave", str(tmp_path))
+    pd.testing.assert_frame_equal(lido, df)
+    for col in df.columns:
+        assert [type(v) for v in lido[col]] == [type(v) for v in df[col]], col
+
+
+def test_snapshot_sem_pickle(tmp_path):
+    df = ler_planilha(conteudo_planilha(200), "sintetico.csv")
+    salvar_snapshot(df, "chave", str(tmp_path))
+    pasta = caminho_snapshot("chave", str(tmp_path))
+    for nome in os.listdir(pasta):
+        if nome.endswith(".npy"):
+            assert np.load(os.path.join(pasta, nome), allow_pickle=False).dtype != object
+
+
+def test_snapshot_de_versao_antiga_e_substituido(tmp_path):
+    df = ler_planilha(conteudo_planilha(200), "sintetico.csv")
+    pasta = caminho_snapshot("chave", str(tmp_path))
+    os.makedirs(pasta)
+    with open(os.path.join(pasta, "meta.json"), "w", encoding="utf-8") as f:
+        f.write('{"versao": 1}')
+
+    assert ler_snapshot("chave", str(tmp_path)) is None
+    salvar_snapshot(df, "chave", str(tmp_path))
+    pd.testing.assert_frame_equal(ler_snapshot("chave", str(tmp_path)), df)
+
+
+def test_compilado_mapeado_igual_ao_dataset(tmp_path, planilha_csv, novo_analisador, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    referencia = novo_analisador(planilha_csv)
+    pasta = salvar_compilado(referencia.dataset, str(tmp_path / "snapshots"))
+    assert pasta is not None
+
+    # Como um processo da linha de comando: só a pasta do snapshot, sem a planilha
+    cli._inicializar_processo(pasta, None, "")
+    analisador = cli._analyzer_processo
+    dataset = analisador.dataset
+    assert isinstance(dataset.lucro_exato.base, np.memmap)
+    for nome, array in referencia.dataset.codigos.items():
+        assert np.array_equal(dataset.codigos[nome], array)
+
+    for atual in (referencia, analisador):
+        assert atual.iniciar_analise(*SELECAO, 15)[0]
+    assert passos(analisador) == passos(referencia)
+    ultima = len(analisador.etapas_filtros) - 1
+    pd.testing.assert_frame_equal(analisador.obter_df_etapa(ultima), referencia.obter_df_etapa(ultima))
+    assert analisador.gerar_relatorio_excel(ultima)[0] is not None
+    # Só as linhas das etapas foram lidas: a planilha inteira nunca virou DataFrame
+    assert dataset._df is None
@@ -0,0 +1,40 @@
+import time
+
+from backtest.tarefas import CONCLUIDA, FilaAnalises
+
+from conftest import SELECAO
+
+
+def esperar(tarefa):
+    while tarefa.ativa:
+        time.sleep(0.01)
+
+
+def test_tarefa_isolada_por_sessao_e_adotada_uma_vez(planilha_csv, novo_analisador):
+    sessao_a, sessao_b = novo_analisador(planilha_csv), novo_analisador(planilha_csv)
+    fila = FilaAnalises(1, 1)
+    tarefa = fila.enviar(sessao_a.derivar(), *SELECAO, 15, sessao="a")
+    esperar(tarefa)
+    assert tarefa.estado == CONCLUIDA
+
+    chave = sessao_b.chave_busca(*SELECAO)
+    assert chave == sessao_a.chave_busca(*SELECAO)
+    assert fila.tarefa(chave, "b") is None
+    assert fila.tarefa(chave, "a") is tarefa
+
+    assert tarefa.adotar(sessao_a)
+    assert not tarefa.adotar(sessao_b)
+    assert not sessao_b.etapas_filtros
+    assert fila.tarefa(chave, "a") is None
+
+
+def test_mesma_busca_de_outra_sessao_nao_e_reaproveitada(planilha_csv, novo_analisador):
+    analisador = novo_analisador(planilha_csv)
+    fila = FilaAnalises(1, 1)
+    primeira = fila.enviar(analisador.derivar(), *SELECAO, 15, sessao="a")
+    segunda = fila.enviar(analisador.derivar(), *SELECAO, 15, sessao="b")
+    assert segunda is not primeira
+    segunda.cancelar()
+    esperar(primeira)
+    esperar(segunda)
+    assert primeira.estado == CONCLUIDA